@@ -0,0 +1,129 @@
+"""Memory and time of parsing vimgolf.com pages.
+
+    python benchmarks/html_memory.py [--record] [PAGE ...]
+
+For each page (a listing page if its name starts with 'listing', else a
+challenge page), this shows the nodes built by parse_html, the memory they
+take and the peak memory of the parse, and the same for the streaming
+extractor used by 'vimgolf ls' or 'vimgolf show'.
+
+Without PAGE arguments, the pages in benchmarks/pages are used. With
+--record, the listing page and the page of its first challenge are first
+downloaded from GOLF_HOST into benchmarks/pages. If there are no recorded
+pages, synthetic pages with the structure of vimgolf.com pages are used.
+"""
+
+import gc
+import importlib
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from vimgolf.challenge import get_challenge_url  # noqa: E402
+from vimgolf.html import parse_html  # noqa: E402
+from vimgolf.utils import http_request  # noqa: E402
+
+ls_module = importlib.import_module('vimgolf.commands.ls')
+show_module = importlib.import_module('vimgolf.commands.show')
+
+PAGES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'pages')
+
+ROUNDS = 5
+
+
+def record():
+    os.makedirs(PAGES_PATH, exist_ok=True)
+    listing_html = http_request(ls_module.get_listing_url()).body
+    challenge_id = ls_module.extract_listings_from_page(listing_html, 1, {})[0].id
+    challenge_html = http_request(get_challenge_url(challenge_id)).body
+    for name, page_html in [('listing.html', listing_html), ('challenge.html', challenge_html)]:
+        with open(os.path.join(PAGES_PATH, name), 'w') as f:
+            f.write(page_html)
+
+
+def synthetic_pages():
+    indent = ' ' * 10
+    listings = ''.join(
+        '{0}<div class="challenge">\n'
+        '{0}  <a href="/challenges/{1:024x}">Challenge number {2}</a> - {3} entries\n'
+        '{0}  <p>Description of challenge {2}, <b>with</b> some <em>markup</em>.</p>\n'
+        '{0}</div>\n'.format(indent, 0x5e00000 + i, i, i * 7 % 500)
+        for i in range(400))
+    listing_html = (
+        '<!DOCTYPE html>\n<html>\n<head>\n  <title>VimGolf</title>\n'
+        '  <link rel="stylesheet" href="/main.css">\n</head>\n<body>\n'
+        '  <div id="header"><a href="/"><img src="/logo.png"></a></div>\n'
+        '  <div id="content">\n    <div class="grid_7">\n{}    </div>\n  </div>\n'
+        '</body>\n</html>\n').format(listings)
+    leaders = ''.join(
+        '{0}<div>\n'
+        '{0}  <h6>\n{0}    <a href="/{1}"><img src="/avatar/{1}.png"></a>\n'
+        '{0}    <a href="/{1}">@{1}</a>\n{0}  </h6>\n'
+        '{0}  <div>{2}</div>\n{0}</div>\n'.format(indent, 'golfer{}'.format(i), 10 + i // 3)
+        for i in range(300))
+    challenge_html = (
+        '<!DOCTYPE html>\n<html>\n<head>\n  <title>VimGolf</title>\n</head>\n<body>\n'
+        '  <div id="header"><a href="/"><img src="/logo.png"></a></div>\n'
+        '  <div id="content">\n    <div class="grid_7">\n'
+        '      <h3>\n        Challenge name\n      </h3>\n'
+        '      <p>Some <b>description</b> of the challenge.</p>\n'
+        '      <h5>Start file</h5>\n      <pre>{0}</pre>\n'
+        '      <h5>End file</h5>\n      <pre>{0}</pre>\n'
+        '    </div>\n    <div class="grid_5">\n{1}    </div>\n  </div>\n'
+        '</body>\n</html>\n').format('line of text\n' * 50, leaders)
+    return [('listing (synthetic)', listing_html), ('challenge (synthetic)', challenge_html)]
+
+
+def measure(fn):
+    """(result, seconds, bytes retained by result, peak bytes) of fn()."""
+    gc.collect()
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        fn()
+    seconds = (time.perf_counter() - start) / ROUNDS
+    tracemalloc.start()
+    result = fn()
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, seconds, retained, peak
+
+
+def count_nodes(nodes):
+    return sum(1 for _ in nodes)
+
+
+def main(args):
+    if '--record' in args:
+        args.remove('--record')
+        record()
+    if args:
+        pages = []
+        for path in args:
+            with open(path) as f:
+                pages.append((os.path.basename(path), f.read()))
+    elif os.path.isdir(PAGES_PATH) and os.listdir(PAGES_PATH):
+        pages = []
+        for name in sorted(os.listdir(PAGES_PATH)):
+            with open(os.path.join(PAGES_PATH, name)) as f:
+                pages.append((name, f.read()))
+    else:
+        pages = synthetic_pages()
+    for name, page_html in pages:
+        nodes, seconds, retained, peak = measure(lambda: parse_html(page_html))
+        print('{} ({} KiB)'.format(name, len(page_html) // 1024))
+        print('  parse_html: {} nodes, {:.1f} ms, {} KiB retained, {} KiB peak'.format(
+            count_nodes(nodes), seconds * 1000, retained // 1024, peak // 1024))
+        if name.startswith('listing'):
+            extract = lambda: ls_module.extract_listings_from_page(page_html, ls_module.LISTING_LIMIT, {})
+        else:
+            extract = lambda: show_module.extract_data_from_page(page_html)
+        _, seconds, retained, peak = measure(extract)
+        print('  extractor:  {:.1f} ms, {} KiB retained, {} KiB peak'.format(
+            seconds * 1000, retained // 1024, peak // 1024))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
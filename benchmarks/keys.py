@@ -0,0 +1,65 @@
+"""Benchmark for parsing multi-megabyte keylogs (e.g., from macro-heavy sessions).
+
+Usage: python benchmarks/keys.py [MEGABYTES]
+"""
+
+import random
+import sys
+import time
+
+from vimgolf.keys import Keys, IGNORED_KEYSTROKES, get_keycode_repr, to_bytes
+
+
+def reference_from_raw_keys(raw_keys):
+    """The list-based parser that was used before the array-backed one."""
+    keycodes = []
+    tmp = list(reversed(raw_keys))
+    while tmp:
+        b0 = tmp.pop()
+        if b0 == 0x80:
+            b1 = tmp.pop()
+            b2 = tmp.pop()
+            keycode = bytes((b1, b2))
+        else:
+            keycode = to_bytes(b0)
+        keycodes.append(keycode)
+    keycodes = [keycode for keycode in keycodes if keycode not in IGNORED_KEYSTROKES]
+    return [get_keycode_repr(int.from_bytes(keycode, 'big')) for keycode in keycodes]
+
+
+def generate_keylog(size, seed=0):
+    rng = random.Random(seed)
+    special = [b'\x80kb', b'\x80ku', b'\x80kd', b'\x80\xfd\x35', b'\x80\xfc\x04']
+    chunks = []
+    total = 0
+    while total < size:
+        if rng.random() < 0.1:
+            chunk = rng.choice(special)
+        else:
+            chunk = bytes(rng.choice(b'abcdefghijklmnopqrstuvwxyz:%/\x1b\r') for _ in range(rng.randint(1, 40)))
+        chunks.append(chunk)
+        total += len(chunk)
+    return b''.join(chunks)
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    megabytes = float(sys.argv[1]) if len(sys.argv) > 1 else 4
+    raw_keys = generate_keylog(int(megabytes * 1024 * 1024))
+    reference, reference_elapsed = timed(reference_from_raw_keys, raw_keys)
+    keys, parse_elapsed = timed(Keys.from_raw_keys, raw_keys)
+    reprs, reprs_elapsed = timed(lambda: keys.keycode_reprs)
+    assert reprs == reference
+    print('keylog: {:.1f} MB, {} keys'.format(len(raw_keys) / 1024 / 1024, keys.score))
+    print('reference parse+reprs: {:.3f}s'.format(reference_elapsed))
+    print('parse: {:.3f}s, reprs: {:.3f}s'.format(parse_elapsed, reprs_elapsed))
+    print('keycodes: {} bytes'.format(keys.keycodes.itemsize * len(keys.keycodes)))
+
+
+if __name__ == '__main__':
+    main()
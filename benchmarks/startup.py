@@ -0,0 +1,74 @@
+"""Startup time of the CLI, for trivial commands.
+
+    python benchmarks/startup.py [ROUNDS]
+
+This shows the slowest imports of vimgolf.main (python -X importtime), and
+the median wall time of 'vimgolf version' beyond that of importing click
+(which the CLI can't start without), compared to TARGET_MS. The exit status
+is 1 if the target is missed.
+"""
+
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Max milliseconds of 'vimgolf version' beyond 'python -c "import click"'
+TARGET_MS = 25
+
+# Number of imports shown
+TOP_IMPORTS = 10
+
+
+def run(args):
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    return subprocess.run(
+        [sys.executable] + args,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+        check=True,
+    )
+
+
+def import_times():
+    """(cumulative microseconds, module) of the imports of vimgolf.main, slowest first."""
+    stderr = run(['-X', 'importtime', '-c', 'import vimgolf.main']).stderr
+    times = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, module = line.split('|')
+        times.append((int(cumulative), module.strip()))
+    return sorted(times, reverse=True)
+
+
+def wall_time(args, rounds):
+    """Median seconds of running the interpreter with args."""
+    times = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        run(args)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def main(args):
+    rounds = int(args[0]) if args else 20
+    print('Slowest imports of vimgolf.main (cumulative):')
+    for cumulative, module in import_times()[:TOP_IMPORTS]:
+        print('  {:7.1f} ms  {}'.format(cumulative / 1000, module))
+    click = wall_time(['-c', 'import click'], rounds)
+    version = wall_time(['-m', 'vimgolf.main', 'version'], rounds)
+    overhead_ms = (version - click) * 1000
+    print("'vimgolf version': {:.1f} ms ({:.1f} ms beyond importing click, target {} ms)".format(
+        version * 1000, overhead_ms, TARGET_MS))
+    return 0 if overhead_ms <= TARGET_MS else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
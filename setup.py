@@ -36,7 +36,13 @@ setup(
     long_description=open('README.md').read(),
     long_description_content_type='text/markdown',
     name='vimgolf',
-    package_data={'vimgolf': ['version.txt', 'vimgolf.vimrc']},
+    package_data={'vimgolf': [
+        'version.txt',
+        'vimgolf.vimrc',
+        'vimgolf-inspect.vim',
+        'vimgolf-replay.vim',
+        'vimgolf-worker.vim',
+    ]},
     packages=['vimgolf'],
     python_requires='>=3.5',
     url='https://github.com/dstein64/vimgolf',
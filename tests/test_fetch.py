@@ -0,0 +1,88 @@
+import threading
+import time
+
+import pytest
+
+from vimgolf.fetch import FetchTimeout, fetch_all, gather, run
+
+
+@pytest.fixture
+def requests(monkeypatch):
+    """Fake http_request, returning the URL after a delay given by its fragment."""
+    state = {'in_flight': 0, 'max_in_flight': 0, 'started': []}
+    lock = threading.Lock()
+
+    def http_request(url, data=None):
+        with lock:
+            state['in_flight'] += 1
+            state['max_in_flight'] = max(state['max_in_flight'], state['in_flight'])
+            state['started'].append(time.monotonic())
+        try:
+            time.sleep(float(url.split('#')[-1]))
+            if 'error' in url:
+                raise ValueError(url)
+            return url
+        finally:
+            with lock:
+                state['in_flight'] -= 1
+
+    monkeypatch.setattr('vimgolf.fetch.http_request', http_request)
+    return state
+
+
+def test_fetch_all_per_host_limit(requests):
+    urls = ['http://a/{}#0.05'.format(i) for i in range(6)] + ['http://b/#0.05']
+    assert fetch_all(urls, per_host=2) == urls
+    assert requests['max_in_flight'] == 3
+
+
+def test_interval(requests):
+    fetch_all(['http://a/{}#0'.format(i) for i in range(3)], interval=0.1)
+    started = requests['started']
+    # The times are taken by the request threads, which may start a bit late
+    assert started[2] - started[0] >= 0.19
+
+
+def test_deadlines(requests):
+    with pytest.raises(FetchTimeout):
+        fetch_all(['http://a/#1'], timeout=0.1)
+    start = time.monotonic()
+    with pytest.raises(FetchTimeout):
+        fetch_all(['http://a/{}#0.1'.format(i) for i in range(10)], per_host=1, deadline=0.25)
+    assert time.monotonic() - start < 0.5
+
+
+def test_abandoned_requests(requests):
+    async def main(fetcher):
+        with pytest.raises(FetchTimeout):
+            await fetcher.fetch('http://a/1#0.3')
+        # The timed out request is still in flight, so the next one waits for it
+        return await fetcher.fetch('http://a/2#0')
+
+    assert run(main, per_host=1, timeout=0.1) == 'http://a/2#0'
+    started = requests['started']
+    assert started[1] - started[0] >= 0.29
+    # The abandoned requests don't keep the process from exiting
+    threads = set(threading.enumerate())
+    start = time.monotonic()
+    with pytest.raises(FetchTimeout):
+        fetch_all(['http://a/#5'], timeout=0.1)
+    assert time.monotonic() - start < 1
+    abandoned = set(threading.enumerate()) - threads
+    assert abandoned and all(thread.daemon for thread in abandoned)
+
+
+def test_gather_cancels_on_error(requests):
+    finished = []
+
+    async def fetch(fetcher, url):
+        response = await fetcher.fetch(url)
+        finished.append(response)
+        return response
+
+    async def main(fetcher):
+        return await gather(fetch(fetcher, 'http://a/error#0'), fetch(fetcher, 'http://a/#0.2'))
+
+    with pytest.raises(ValueError):
+        run(main)
+    assert finished == []
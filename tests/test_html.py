@@ -0,0 +1,110 @@
+import importlib
+
+import pytest
+
+from vimgolf.html import (
+    extract,
+    get_element_by_id,
+    get_elements_by_classname,
+    get_text,
+    parse_html,
+    select,
+    select_one,
+)
+
+ls_module = importlib.import_module('vimgolf.commands.ls')
+show_module = importlib.import_module('vimgolf.commands.show')
+
+LISTING_PAGE = '''<html><head><title>VimGolf</title></head><body>
+<div id="content"><div class="grid_7">
+{}
+</div></div>
+<div id="footer"><p>Footer</p></div>
+</body></html>'''
+
+LISTING = '''<div class="challenge">
+  <a href="/challenges/{0}">Challenge {1}</a> - {1} entries
+  <p>Description <b>{1}</b><br></p>
+</div>'''
+
+CHALLENGE_PAGE = '''<html><body>
+<div id="header"><div class="grid_5">Not the leaderboard</div></div>
+<div id="content">
+  <div class="grid_7">
+    <h3>Change
+      the name</h3>
+    <p>Some <em>description</em></p>
+    <pre>in</pre>
+  </div>
+  <div class="grid_5">
+    <div><h6><a href="/golfer"><img src="a.png"></a> <a href="/golfer">@golfer</a></h6><div>7</div></div>
+    <div><h6><a href="/other"><img src="b.png"/></a> <a href="/other">other</a></h6><div>12</div></div>
+  </div>
+</div>
+<div id="footer">{}</div>
+</body></html>'''
+
+
+def challenge_id(i):
+    return '{:024d}'.format(i)
+
+
+def test_extract_listings():
+    page = LISTING_PAGE.format('\n'.join(LISTING.format(challenge_id(i), i) for i in range(1, 16)))
+    listings = ls_module.extract_listings_from_page(page, limit=10, stored_challenges={})
+    assert [listing.id for listing in listings] == [challenge_id(i) for i in range(1, 11)]
+    assert listings[1].name == 'Challenge 2'
+    assert listings[1].n_entries == 2
+    # The parse stops once the listings are collected
+    parser = extract(ls_module.ListingParser(2), page, chunk_size=64)
+    assert len(parser.elements) == 2
+
+
+def test_extract_listings_across_chunks():
+    page = LISTING_PAGE.format('\n'.join(LISTING.format(challenge_id(i), i * 1000) for i in range(1, 4)))
+    expected = [('Challenge {}'.format(i * 1000), i * 1000) for i in range(1, 4)]
+    # Chunk boundaries fall at every position within the listings
+    for chunk_size in range(1, 120):
+        parser = extract(ls_module.ListingParser(10), page, chunk_size=chunk_size)
+        listings = [ls_module.listing_from_element(element, {}) for element in parser.elements]
+        assert [(listing.name, listing.n_entries) for listing in listings] == expected, chunk_size
+    assert parser.getpos()[0] < 20
+
+
+def test_extract_challenge_page():
+    data = show_module.extract_data_from_page(CHALLENGE_PAGE.format('x' * 100000))
+    assert data['name'] == 'Change the name'
+    assert data['description'] == 'Some description'
+    assert [(leader.username, leader.score) for leader in data['leaders']] == [('golfer', 7), ('other', 12)]
+    parser = extract(show_module.ChallengePageParser(), CHALLENGE_PAGE.format('<p>' * 1000), chunk_size=64)
+    assert parser.done
+    assert parser.getpos()[0] < 20
+
+
+def test_select():
+    document = parse_html(CHALLENGE_PAGE.format('<a class="x y">1</a><a class="y">2</a>'))
+    assert get_element_by_id(document, 'content').tag == 'div'
+    assert len(get_elements_by_classname(document, 'grid_5')) == 2
+    assert select(document, '#footer a.y.x')[0].get_attr('class') == 'x y'
+    assert len(select(document, '.y')) == 2
+    scores = select(document, '#content > .grid_5 > div > div')
+    assert [score.children[0].data for score in scores] == ['7', '12']
+    assert len(select(document, '#content .grid_5 a')) == 4
+    assert len(select(document, 'body > div.grid_5')) == 0
+    grid_7 = select_one(document, 'div#content > div.grid_7')
+    assert select_one(grid_7, '> em') is None
+    assert select_one(grid_7, 'em').children[0].data == 'description'
+    assert select_one(document, '#missing') is None
+    with pytest.raises(ValueError):
+        select(document, 'div >')
+
+
+def test_whitespace_and_slots():
+    page = '<div>\n  <p>a <b>b</b> <i>c</i></p>\n  <pre>\n</pre>\n</div>'
+    document = parse_html(page)
+    div = select_one(document, 'div')
+    assert [child.tag for child in div.children] == ['p', 'pre']
+    assert get_text([div]) == 'a b c\n'
+    assert len(list(parse_html(page, keep_whitespace=True))) == len(list(document)) + 3
+    assert not hasattr(div, '__dict__')
+    assert not hasattr(div.children[0].children[0], '__dict__')
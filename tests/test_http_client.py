@@ -0,0 +1,203 @@
+import gzip
+import http.server
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+from vimgolf.http_cache import HttpCache, OfflineError
+from vimgolf.http_client import HttpClient, HttpError
+
+
+class Handler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # path -> statuses to return before succeeding
+    failures = {}
+    connections = set()
+    requests = []
+    # Body of /slow, which takes 0.3s to answer
+    slow_body = b''
+
+    def do_GET(self):
+        Handler.connections.add(self.client_address)
+        Handler.requests.append(self.path)
+        if self.headers['Proxy-Authorization']:
+            Handler.requests.append(self.headers['Proxy-Authorization'])
+        statuses = Handler.failures.get(self.path)
+        if statuses:
+            self.send_body(statuses.pop(0), b'')
+        elif self.path == '/etag' and self.headers['If-None-Match'] == '"v1"':
+            self.send_response(304)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+        elif self.path == '/etag':
+            self.send_body(200, b'v1', etag='"v1"')
+        elif self.path == '/redirect':
+            self.send_response(302)
+            self.send_header('Location', '/gzip')
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+        elif self.path == '/slow':
+            time.sleep(0.3)
+            self.send_body(200, Handler.slow_body)
+        elif self.path == '/gzip':
+            self.send_body(200, gzip.compress('vimgolf ✅'.encode('utf-8')), encoding='gzip')
+        else:
+            self.send_body(200, self.path.encode('utf-8'))
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers['Content-Length']))
+        self.send_body(200, body)
+
+    def send_body(self, status, body, encoding=None, etag=None):
+        self.send_response(status)
+        self.send_header('Content-Type', 'text/plain; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        if encoding:
+            self.send_header('Content-Encoding', encoding)
+        if etag:
+            self.send_header('ETag', etag)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def host(monkeypatch):
+    for name in ('http_proxy', 'https_proxy', 'no_proxy', 'all_proxy'):
+        monkeypatch.delenv(name, raising=False)
+        monkeypatch.delenv(name.upper(), raising=False)
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    Handler.failures = {}
+    Handler.connections = set()
+    Handler.requests = []
+    Handler.slow_body = b''
+    thread = threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True)
+    thread.start()
+    yield 'http://127.0.0.1:{}'.format(server.server_port)
+    server.shutdown()
+    server.server_close()
+
+
+def test_keep_alive(host):
+    client = HttpClient()
+    assert client.request(host + '/a').body == '/a'
+    assert client.request(host + '/b?page=2').body == '/b?page=2'
+    assert len(Handler.connections) == 1
+    client.close()
+
+
+def test_gzip_and_redirect(host):
+    client = HttpClient()
+    response = client.request(host + '/redirect')
+    assert response.code == 200
+    assert response.body == 'vimgolf ✅'
+    client.close()
+
+
+def test_post(host):
+    client = HttpClient()
+    assert client.request(host + '/entry.json', data=b'entry=dd').body == 'entry=dd'
+    client.close()
+
+
+def test_retries(host):
+    client = HttpClient(backoff=0)
+    Handler.failures['/flaky'] = [503, 500]
+    assert client.request(host + '/flaky').body == '/flaky'
+    Handler.failures['/down'] = [503] * 10
+    with pytest.raises(HttpError):
+        client.request(host + '/down')
+    assert len(Handler.failures['/down']) == 10 - 4
+    client.close()
+
+
+def test_cache_fresh_and_offline(host, tmp_path):
+    cache = HttpCache(str(tmp_path), HttpClient(), ttl=60)
+    assert cache.request(host + '/a').body == '/a'
+    assert cache.request(host + '/a').body == '/a'
+    assert Handler.requests == ['/a']
+    cache.offline = True
+    assert cache.request(host + '/a').body == '/a'
+    with pytest.raises(OfflineError):
+        cache.request(host + '/b')
+    assert Handler.requests == ['/a']
+    cache.client.close()
+
+
+def test_cache_revalidation(host, tmp_path):
+    cache = HttpCache(str(tmp_path), HttpClient(), ttl=0, stale=0)
+    assert cache.request(host + '/etag').body == 'v1'
+    response = cache.request(host + '/etag')
+    assert response.code == 200
+    assert response.body == 'v1'
+    assert Handler.requests == ['/etag', '/etag']
+    cache.client.close()
+
+
+def test_cache_eviction(host, tmp_path):
+    cache = HttpCache(str(tmp_path), HttpClient(), ttl=60)
+    for i, path in enumerate(['/a', '/b', '/c']):
+        cache.request(host + path)
+        os.utime(cache._entry_path(host + path), (1000 * (i + 1), 1000 * (i + 1)))
+    size = os.path.getsize(cache._entry_path(host + '/c'))
+    # The least recently fetched responses are evicted beyond max_bytes
+    cache.evict(max_bytes=size * 2 - 1, max_age=float('inf'))
+    assert sorted(os.listdir(str(tmp_path))) == [os.path.basename(cache._entry_path(host + '/c'))]
+    # ... and responses fetched more than max_age ago
+    cache.evict(max_age=0)
+    assert os.listdir(str(tmp_path)) == []
+    cache.client.close()
+
+
+def test_proxy(host, monkeypatch):
+    # The test server acts as the proxy, answering with the requested URL
+    monkeypatch.setenv('http_proxy', host.replace('http://', 'http://golfer:secret@'))
+    client = HttpClient()
+    assert client.request('http://vimgolf.invalid/a').body == 'http://vimgolf.invalid/a'
+    assert Handler.requests == ['http://vimgolf.invalid/a', 'Basic Z29sZmVyOnNlY3JldA==']
+    client.close()
+    # Hosts in no_proxy are requested directly
+    monkeypatch.setenv('no_proxy', '127.0.0.1')
+    Handler.requests = []
+    client = HttpClient()
+    assert client.request(host + '/b').body == '/b'
+    assert Handler.requests == ['/b']
+    client.close()
+
+
+# Prints the body of sys.argv[1], requested through the response cache, as a command does
+REQUEST_SCRIPT = '''
+import os
+import sys
+import vimgolf
+from vimgolf.utils import http_request
+os.makedirs(vimgolf.VIMGOLF_HTTP_CACHE_PATH, exist_ok=True)
+print(http_request(sys.argv[1]).body)
+'''
+
+
+def test_revalidation_across_processes(host, tmp_path):
+    env = dict(
+        os.environ,
+        PYTHONPATH=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        XDG_CACHE_HOME=str(tmp_path),
+        GOLF_HTTP_CACHE_TTL='0',
+    )
+
+    def request():
+        output = subprocess.check_output([sys.executable, '-c', REQUEST_SCRIPT, host + '/slow'], env=env)
+        return output.decode('utf-8').strip()
+
+    Handler.slow_body = b'v1'
+    assert request() == 'v1'
+    Handler.slow_body = b'v2'
+    # The stale response is used, and revalidated before the process exits...
+    assert request() == 'v1'
+    # ... so that the next process gets the new one
+    assert request() == 'v2'
@@ -0,0 +1,65 @@
+from array import array
+
+from vimgolf.keys import Keys, KeycodeReprs, parse_keycodes, get_keycode_repr
+
+
+def test_parse_keycodes_single_and_double_bytes():
+    raw_keys = b'ix\x1b\x80kb:wq\r'
+    assert parse_keycodes(raw_keys) == array('H', [
+        ord('i'), ord('x'), 0x1b, 0x6b62, ord(':'), ord('w'), ord('q'), 0x0d,
+    ])
+
+
+def test_parse_keycodes_bytes_like():
+    raw_keys = b'dd\x80kuZZ'
+    expected = parse_keycodes(raw_keys)
+    assert parse_keycodes(bytearray(raw_keys)) == expected
+    assert parse_keycodes(memoryview(raw_keys)) == expected
+
+
+def test_parse_keycodes_truncated_escape():
+    assert parse_keycodes(b'x\x80k') == array('H', [ord('x')])
+
+
+def test_keycode_reprs():
+    assert get_keycode_repr(ord('a')) == 'a'
+    assert get_keycode_repr(0x1b) == '<Esc>'
+    assert get_keycode_repr(0x6b62) == '<BS>'
+    assert get_keycode_repr(0xabcd) == '[\\xab\\xcd]'
+
+
+def test_keys_from_raw_keys_skips_ignored_keystrokes():
+    keys = Keys.from_raw_keys(b'\x80\xfd\x35i\x80\xfd\x62x\x1bZZ')
+    assert keys.keycode_reprs == ['i', 'x', '<Esc>', 'Z', 'Z']
+    assert keys.score == 5
+
+
+def test_keycode_reprs_prefix():
+    keycode_reprs = KeycodeReprs('Ji1<Esc>ZZ')
+    prefix = keycode_reprs.prefix(4)
+    assert len(keycode_reprs) == 6
+    assert prefix.tokens == ['J', 'i', '1', '<Esc>']
+    assert prefix.joined == 'Ji1<Esc>'
+    assert prefix.call_feedkeys == 'call feedkeys("Ji1\\<Esc>", "t")'
+    assert KeycodeReprs('"a\\<CR>').call_feedkeys == 'call feedkeys("\\"a\\\\\\<CR>", "t")'
+
+
+def test_keycode_reprs_add():
+    a = KeycodeReprs('ix[y]', literal_lt='[', literal_gt=']')
+    b = KeycodeReprs('<Esc>ZZ')
+    assert (a + b).tokens == ['i', 'x', '<', 'y', '>', '<Esc>', 'Z', 'Z']
+    # a's tokens are shared by both concatenations, but each sees its own suffix
+    c = a + KeycodeReprs('<CR>')
+    assert (a + b).joined == 'ix<y><Esc>ZZ'
+    assert c.joined == 'ix<y><CR>'
+    assert a.joined == 'ix<y>'
+
+
+def test_keycode_reprs_tokens_copy():
+    a = KeycodeReprs('x')
+    tokens = a.tokens
+    a + KeycodeReprs('y')
+    tokens.append('z')
+    assert tokens == ['x', 'z']
+    assert a.tokens == ['x']
+    assert (a + KeycodeReprs('y')).tokens == ['x', 'y']
@@ -0,0 +1,79 @@
+import glob
+import logging
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROCESSES = 4
+LINES = 300
+
+# Logs LINES records to the log at sys.argv[1] (rotated every 4 KiB), as process sys.argv[2]
+SCRIPT = '''
+import logging
+import sys
+import vimgolf.log
+vimgolf.log.LOG_MAX_BYTES = 4096
+vimgolf.log.LOG_BACKUP_COUNT = 1000
+logger = logging.getLogger('test')
+vimgolf.log.start_logging(logger, sys.argv[1], level='DEBUG')
+for i in range({}):
+    logger.debug('process %s line %s', sys.argv[2], i)
+'''.format(LINES)
+
+
+def test_concurrent_appends(tmp_path):
+    path = str(tmp_path / 'vimgolf.log')
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    processes = [
+        subprocess.Popen([sys.executable, '-c', SCRIPT, path, str(p)], env=env)
+        for p in range(PROCESSES)
+    ]
+    assert [process.wait() for process in processes] == [0] * PROCESSES
+    logs = glob.glob(path + '*')
+    logs.remove(path + '.lock')
+    # The log was rotated
+    assert len(logs) > 1
+    messages = []
+    for log in logs:
+        with open(log) as f:
+            messages.extend(line.rstrip('\n').split(' - ')[-1] for line in f)
+    expected = ['process {} line {}'.format(p, i) for p in range(PROCESSES) for i in range(LINES)]
+    # Each line is written once, and intact
+    assert sorted(messages) == sorted(expected)
+
+
+def test_log_level(tmp_path, monkeypatch):
+    import vimgolf.log
+    level_path = tmp_path / 'log_level'
+    monkeypatch.setattr(vimgolf.log, 'VIMGOLF_LOG_LEVEL_PATH', str(level_path))
+    monkeypatch.delenv('GOLF_LOG_LEVEL', raising=False)
+    assert vimgolf.log.get_log_level() == vimgolf.log.LOG_LEVEL
+    level_path.write_text('debug\n')
+    assert vimgolf.log.get_log_level() == 'DEBUG'
+    monkeypatch.setenv('GOLF_LOG_LEVEL', 'warning')
+    assert vimgolf.log.get_log_level() == 'WARNING'
+    monkeypatch.setenv('GOLF_LOG_LEVEL', 'loud')
+    assert vimgolf.log.get_log_level() == vimgolf.log.LOG_LEVEL
+    assert logging.getLevelName(vimgolf.log.LOG_LEVEL) == logging.INFO
+
+
+def test_rotation_checked_near_max_bytes(tmp_path, monkeypatch):
+    import vimgolf.log
+    path = str(tmp_path / 'vimgolf.log')
+    handler = vimgolf.log.SharedRotatingFileHandler(path, max_bytes=1000, backup_count=1)
+    stats = []
+    stat = os.stat
+    monkeypatch.setattr(os, 'stat', lambda *args, **kwargs: stats.append(args) or stat(*args, **kwargs))
+    record = logging.LogRecord('test', logging.INFO, __file__, 0, 'x' * 9, None, None)
+    for _ in range(50):
+        handler.emit(record)
+    # The log is only looked at once it's about to reach max_bytes
+    assert stats == []
+    for _ in range(100):
+        handler.emit(record)
+    assert stats
+    assert os.path.getsize(path) < 1000
+    assert os.path.exists(path + '.1')
+    handler.close()
@@ -0,0 +1,134 @@
+import os
+import shutil
+
+import pytest
+
+import vimgolf.replay_cache
+import vimgolf.vim
+from vimgolf.replay import replay, snapshot_path
+from vimgolf.replay_cache import evict, get_store
+from vimgolf.vim import SessionLimits
+from vimgolf.worker import WorkerPool
+
+needs_vim = pytest.mark.skipif(shutil.which('vim') is None, reason='vim is not installed')
+
+# So that a job that never finishes fails the test
+POOL_LIMITS = SessionLimits(timeout=10, cpu=None, memory=None)
+
+
+@pytest.fixture
+def workspace(tmp_path, monkeypatch):
+    monkeypatch.setattr(vimgolf.vim, 'VIMGOLF_EDITOR_CACHE_PATH', str(tmp_path / 'editor.json'))
+    monkeypatch.setattr(vimgolf.vim, '_editor', None)
+    workspace = tmp_path / 'workspace'
+    workspace.mkdir()
+    (workspace / 'in.txt').write_text('one two\n')
+    return str(workspace)
+
+
+def replay_buffers(workspace, tokens, pool=None):
+    """The buffer lines after each step, and the changedticks, of a replay of tokens."""
+    store = os.path.join(workspace, 'store')
+    steps = replay(os.path.join(workspace, 'in.txt'), tokens, workspace, store, pool=pool)
+    buffers = []
+    for step in steps:
+        with open(snapshot_path(store, step.digest)) as f:
+            buffers.append(f.read().splitlines())
+    return buffers, [step.changedtick for step in steps]
+
+
+def make_entry(root, name, last_used):
+    cache_dir = os.path.join(root, name)
+    os.makedirs(get_store(cache_dir))
+    with open(os.path.join(get_store(cache_dir), 'digest'), 'w') as f:
+        f.write('x' * 100)
+    trie_path = os.path.join(cache_dir, vimgolf.replay_cache.TRIE_FILENAME)
+    with open(trie_path, 'w') as f:
+        f.write('{}')
+    os.utime(trie_path, (last_used, last_used))
+    return cache_dir
+
+
+def test_evict_keeps_entry_in_use(tmp_path, monkeypatch):
+    root = str(tmp_path)
+    monkeypatch.setattr(vimgolf.replay_cache, 'VIMGOLF_REPLAY_CACHE_PATH', root)
+    in_use = make_entry(root, 'in_use', last_used=1000)
+    other = make_entry(root, 'other', last_used=2000)
+    evict(max_bytes=10, keep=in_use)
+    assert os.path.exists(os.path.join(get_store(in_use), 'digest'))
+    assert not os.path.exists(other)
+
+
+@needs_vim
+def test_replay_steps(workspace):
+    buffers, ticks = replay_buffers(workspace, ['d', 'w', 'x'])
+    assert buffers == [['one two'], ['one two'], ['two'], ['wo']]
+    # The buffer is unchanged while the operator is pending
+    assert ticks[0] == ticks[1] < ticks[2] < ticks[3]
+    # Each distinct buffer is stored once
+    assert len(os.listdir(os.path.join(workspace, 'store'))) == 3
+
+
+@needs_vim
+def test_replay_from_start(workspace):
+    store = os.path.join(workspace, 'store')
+    all_steps = replay(os.path.join(workspace, 'in.txt'), ['d', 'w', 'x'], workspace, store)
+    steps = replay(os.path.join(workspace, 'in.txt'), ['d', 'w', 'x'], workspace, store, start=2)
+    assert steps == all_steps[2:]
+
+
+@needs_vim
+def test_replay_after_quit(workspace):
+    buffers, ticks = replay_buffers(workspace, ['d', 'w', 'Z', 'Z', 'x'])
+    # Once vim has exited, the steps see the file as it was written
+    assert buffers == [['one two'], ['one two'], ['two'], ['two'], ['two'], ['two']]
+    assert ticks[-2:] == [-1, -1]
+
+
+@needs_vim
+def test_snapshots_shared_across_replays(workspace):
+    store = os.path.join(workspace, 'store')
+    first = replay(os.path.join(workspace, 'in.txt'), ['d', 'w'], workspace, store)
+    mtimes = {digest: os.stat(snapshot_path(store, digest)).st_mtime_ns for digest in os.listdir(store)}
+    second = replay(os.path.join(workspace, 'in.txt'), ['x', 'd', 'w'], workspace, store)
+    # The same content has the same digest, and its snapshot isn't written again
+    assert first[0].digest == second[0].digest
+    assert sorted(os.listdir(store)) == sorted(set(step.digest for step in first + second))
+    assert all(os.stat(snapshot_path(store, digest)).st_mtime_ns == mtime for digest, mtime in mtimes.items())
+
+
+@needs_vim
+def test_replay_in_pool(workspace):
+    sequences = [['d', 'w', 'x'], ['"', 'a', 'd', 'w', 'Z', 'Z'], [':', 's', '/', 't', '/', '\\', '/', '<CR>']]
+    cold = [replay_buffers(workspace, tokens)[0] for tokens in sequences]
+    with WorkerPool(os.path.join(workspace, 'pool'), 1, POOL_LIMITS) as pool:
+        assert [replay_buffers(workspace, tokens, pool)[0] for tokens in sequences] == cold
+
+
+@needs_vim
+def test_worker_reset_between_jobs(workspace):
+    with WorkerPool(os.path.join(workspace, 'pool'), 1, POOL_LIMITS) as pool:
+        # A mapping, a register and a search pattern set by a job...
+        replay_buffers(workspace, list(':nmap x dd') + ['<CR>'] + list('qqxq/two') + ['<CR>'], pool)
+        # ... don't change how the next job's keys behave
+        buffers, _ = replay_buffers(workspace, ['x', '@', 'q', 'n', 'x'], pool)
+    assert buffers == replay_buffers(workspace, ['x', '@', 'q', 'n', 'x'])[0]
+    assert buffers[-1] == ['e two']
+
+
+@needs_vim
+def test_worker_kept_when_keys_quit(workspace):
+    sequences = [
+        ['d', 'w', 'Z', 'Z'],
+        ['d', 'w', ':', 'w', 'q', '<CR>', 'x'],
+        ['x', 'Z', 'Q'],
+        # Refused, since the buffer is modified
+        ['x', ':', 'q', '<CR>', 'x'],
+        ['d', 'w'],
+    ]
+    cold = [replay_buffers(workspace, tokens)[0] for tokens in sequences]
+    pool_path = os.path.join(workspace, 'pool')
+    with WorkerPool(pool_path, 1, POOL_LIMITS) as pool:
+        assert [replay_buffers(workspace, tokens, pool)[0] for tokens in sequences] == cold
+    # A single vim was started
+    assert os.listdir(pool_path) == ['worker0']
@@ -0,0 +1,37 @@
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules that trivial commands shouldn't import (see benchmarks/startup.py)
+HEAVY_MODULES = [
+    'asyncio',
+    'concurrent.futures',
+    'html.parser',
+    'http.client',
+    'sqlite3',
+    'ssl',
+    'terminaltables',
+    'vimgolf.commands.ls',
+    'vimgolf.vim',
+]
+
+SCRIPT = '''
+import sys
+from vimgolf.main import main
+try:
+    main(['version'])
+except SystemExit:
+    pass
+print(' '.join(sorted(sys.modules)))
+'''
+
+
+def test_trivial_command_imports(tmp_path):
+    env = dict(os.environ, PYTHONPATH=ROOT, XDG_CACHE_HOME=str(tmp_path))
+    output = subprocess.check_output([sys.executable, '-c', SCRIPT], env=env, universal_newlines=True)
+    version, modules = output.splitlines()
+    assert [module for module in HEAVY_MODULES if module in modules.split()] == []
+    # No housekeeping either
+    assert os.listdir(str(tmp_path)) == []
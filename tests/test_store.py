@@ -0,0 +1,135 @@
+import json
+import os
+import time
+
+from vimgolf.challenge import Challenge, prefetch_specs
+from vimgolf.http_client import HttpResponse
+from vimgolf.store import Store
+
+CHALLENGE_ID = 'a' * 24
+
+
+def answer(keys, correct, score, uploaded, timestamp):
+    return {
+        'keys': keys,
+        'correct': correct,
+        'score': score,
+        'uploaded': uploaded,
+        'timestamp': timestamp,
+    }
+
+
+def test_store_answers_and_metadata(tmp_path):
+    store = Store(str(tmp_path / 'vimgolf.db'))
+    assert store.challenge_ids() == []
+    assert store.get_spec(CHALLENGE_ID) is None
+    store.add_answer(CHALLENGE_ID, answer(['d', 'd'], True, 2, False, '2020-01-02T00:00:00'))
+    store.add_answer(CHALLENGE_ID, answer(['x'], False, 1, True, '2020-01-01T00:00:00'))
+    assert store.challenge_ids() == [CHALLENGE_ID]
+    assert [a['keys'] for a in store.get_answers(CHALLENGE_ID)] == [['x'], ['d', 'd']]
+    assert store.get_metadata(CHALLENGE_ID)['answers'] == 2
+    store.update_metadata(CHALLENGE_ID, name='Name')
+    expected = {
+        'name': 'Name',
+        'answers': 2,
+        'uploaded': 1,
+        'correct': 1,
+        'best_score': 2,
+    }
+    assert store.get_metadata(CHALLENGE_ID) == expected
+    assert store.reindex() == 1
+    assert store.get_metadata(CHALLENGE_ID) == expected
+
+
+def test_store_migrates_challenge_directories(tmp_path):
+    challenge_dir = tmp_path / 'challenges' / CHALLENGE_ID
+    os.makedirs(str(challenge_dir))
+    spec = {'in': {'data': 'a', 'type': 'txt'}, 'out': {'data': 'b', 'type': 'txt'}}
+    (challenge_dir / 'spec.json').write_text(json.dumps(spec))
+    (challenge_dir / 'metadata.json').write_text(json.dumps({'name': 'Name', 'answers': 1}))
+    (challenge_dir / 'answers.jsonl').write_text('{}\n'.format(
+        json.dumps(answer(['x'], False, 1, False, '2020-01-01T00:00:00'))))
+    db_path = str(tmp_path / 'vimgolf.db')
+    store = Store(db_path, legacy_path=str(tmp_path / 'challenges'))
+    assert store.get_spec(CHALLENGE_ID) == spec
+    assert store.get_metadata(CHALLENGE_ID)['best_score'] == -1
+    store.close()
+    # Challenges are only imported once
+    store = Store(db_path, legacy_path=str(tmp_path / 'challenges'))
+    assert len(store.get_answers(CHALLENGE_ID)) == 1
+
+
+def test_challenge_values_cached_until_store_changes(tmp_path, monkeypatch):
+    db_path = str(tmp_path / 'vimgolf.db')
+    store = Store(db_path)
+    monkeypatch.setattr('vimgolf.store._store', store)
+    challenge = Challenge(CHALLENGE_ID)
+    assert challenge.spec == {}
+    store.save_spec(CHALLENGE_ID, {'client': '0.4.8'})
+    assert challenge.spec == {'client': '0.4.8'}
+    assert challenge.answers is challenge.answers
+    # Changes by other processes are seen as well
+    Store(db_path).add_answer(CHALLENGE_ID, answer(['x'], True, 1, False, '2020-01-01T00:00:00'))
+    assert len(challenge.answers) == 1
+    assert challenge.metadata['best_score'] == 1
+
+
+def test_store_iter_answers(tmp_path):
+    store = Store(str(tmp_path / 'vimgolf.db'))
+    for i in range(5):
+        timestamp = '2020-01-0{}T00:00:00'.format(i + 1)
+        store.add_answer(CHALLENGE_ID, answer([str(i)], i % 2 == 0, i, i == 4, timestamp))
+    keys = lambda answers: [a['keys'][0] for a in answers]
+    assert keys(store.iter_answers(CHALLENGE_ID)) == ['0', '1', '2', '3', '4']
+    assert keys(store.iter_answers(CHALLENGE_ID, newest_first=True, limit=2)) == ['4', '3']
+    assert keys(store.iter_answers(CHALLENGE_ID, newest_first=True, limit=2, offset=2)) == ['2', '1']
+    assert keys(store.iter_answers(CHALLENGE_ID, correct=True)) == ['0', '2', '4']
+    assert keys(store.iter_answers(CHALLENGE_ID, correct=False, uploaded=False)) == ['1', '3']
+
+
+def test_prefetch_specs(tmp_path, monkeypatch):
+    store = Store(str(tmp_path / 'vimgolf.db'))
+    monkeypatch.setattr('vimgolf.store._store', store)
+    monkeypatch.setattr('vimgolf.challenge.VIMGOLF_CHALLENGES_PATH', str(tmp_path / 'challenges'))
+    spec = {'in': {'data': 'a', 'type': 'txt'}, 'out': {'data': 'b', 'type': 'txt'}}
+    body = json.dumps(spec)
+    requested = []
+
+    def http_request(url, data=None):
+        requested.append(url)
+        return HttpResponse(code=200, msg='OK', headers=[], body=body)
+
+    monkeypatch.setattr('vimgolf.fetch.http_request', http_request)
+    monkeypatch.setattr('vimgolf.challenge.MAX_REQUEST_WORKERS', 1)
+    store.save_spec(CHALLENGE_ID, spec)
+    ids = [CHALLENGE_ID, 'b' * 24, 'c' * 24]
+    # Downloads stop once max_bytes are received, and stored specs aren't downloaded
+    assert prefetch_specs(ids, max_bytes=1) == 1
+    assert len(requested) == 1
+    assert prefetch_specs(ids) == 1
+    assert len(requested) == 2
+    assert all(store.get_spec(challenge_id) == spec for challenge_id in ids)
+
+
+def test_prefetch_specs_deadline(tmp_path, monkeypatch):
+    store = Store(str(tmp_path / 'vimgolf.db'))
+    monkeypatch.setattr('vimgolf.store._store', store)
+    monkeypatch.setattr('vimgolf.fetch.http_request', lambda url, data=None: time.sleep(5))
+    start = time.monotonic()
+    # Pending downloads are abandoned past the deadline
+    assert prefetch_specs(['b' * 24, 'c' * 24], deadline=0.2) == 0
+    assert time.monotonic() - start < 1
+
+
+def test_challenge_metadata_written_only_when_changed(tmp_path, monkeypatch):
+    store = Store(str(tmp_path / 'vimgolf.db'))
+    monkeypatch.setattr('vimgolf.store._store', store)
+    challenge = Challenge(CHALLENGE_ID)
+    challenge.update_metadata('Name', 'Description')
+    version = store.version()
+    challenge.update_metadata('Name', 'Description')
+    challenge.update_metadata(name='Name')
+    assert store.version() == version
+    challenge.update_metadata('Name', 'Other')
+    assert store.version() != version
+    assert challenge.metadata['description'] == 'Other'
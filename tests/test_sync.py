@@ -0,0 +1,103 @@
+import http.server
+import importlib
+import json
+import re
+import threading
+
+import pytest
+
+from vimgolf import Failure
+from vimgolf.commands import sync
+from vimgolf.http_cache import HttpCache
+from vimgolf.http_client import HttpClient
+from vimgolf.store import Store
+
+# The modules, rather than the commands of the same name re-exported by vimgolf.commands
+ls_module = importlib.import_module('vimgolf.commands.ls')
+sync_module = importlib.import_module('vimgolf.commands.sync')
+
+SPEC = {'in': {'data': 'a', 'type': 'txt'}, 'out': {'data': 'b', 'type': 'txt'}}
+
+
+class Site(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # page -> [(challenge ID, entries)]
+    pages = {}
+    broken_pages = set()
+    specs_requested = []
+
+    def do_GET(self):
+        match = re.match(r'/challenges/(\w+)\.json$', self.path)
+        if match:
+            Site.specs_requested.append(match.group(1))
+            self.send_body(200, json.dumps(SPEC))
+            return
+        page = int(self.path.split('page=')[-1]) if 'page=' in self.path else 1
+        if page in Site.broken_pages:
+            self.send_body(404, '')
+            return
+        challenges = ''.join(
+            '<div class="challenge"><a href="/challenges/{0}">{0}</a> - {1} entries</div>'.format(id_, entries)
+            for id_, entries in Site.pages.get(page, []))
+        self.send_body(200, '<html><body>{}</body></html>'.format(challenges))
+
+    def send_body(self, status, body):
+        body = body.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def site(tmp_path, monkeypatch):
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), Site)
+    Site.pages = {
+        1: [('1' * 24, 10), ('2' * 24, 20)],
+        2: [('3' * 24, 30)],
+    }
+    Site.broken_pages = set()
+    Site.specs_requested = []
+    thread = threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True)
+    thread.start()
+    host = 'http://127.0.0.1:{}'.format(server.server_port)
+    store = Store(str(tmp_path / 'vimgolf.db'))
+    monkeypatch.setattr(ls_module, 'GOLF_HOST', host)
+    monkeypatch.setattr('vimgolf.challenge.GOLF_HOST', host)
+    monkeypatch.setattr('vimgolf.challenge.VIMGOLF_CHALLENGES_PATH', str(tmp_path / 'challenges'))
+    monkeypatch.setattr(sync_module, 'VIMGOLF_SYNC_STATE_PATH', str(tmp_path / 'sync.json'))
+    monkeypatch.setattr('vimgolf.store._store', store)
+    cache = HttpCache(str(tmp_path), HttpClient(backoff=0), ttl=0, stale=0)
+    monkeypatch.setattr('vimgolf.http_cache._cache', cache)
+    yield store
+    cache.client.close()
+    server.shutdown()
+    server.server_close()
+
+
+def test_sync(site):
+    sync(interval=0)
+    assert sorted(Site.specs_requested) == ['1' * 24, '2' * 24, '3' * 24]
+    assert all(site.get_spec(id_) == SPEC for id_ in Site.specs_requested)
+    assert site.get_metadata('1' * 24)['name'] == '1' * 24
+    # Only challenges whose number of entries changed are downloaded again
+    Site.specs_requested = []
+    Site.pages[2] = [('3' * 24, 31)]
+    sync(interval=0)
+    assert Site.specs_requested == ['3' * 24]
+
+
+def test_sync_resumes(site):
+    Site.broken_pages = {2}
+    with pytest.raises(Failure):
+        sync(interval=0)
+    assert sorted(Site.specs_requested) == ['1' * 24, '2' * 24]
+    Site.broken_pages = set()
+    Site.specs_requested = []
+    Site.pages[1] = [('1' * 24, 11), ('2' * 24, 21)]
+    sync(interval=0)
+    assert Site.specs_requested == ['3' * 24]
@@ -0,0 +1,60 @@
+import json
+import threading
+
+from click.testing import CliRunner
+
+import vimgolf.trace
+from vimgolf.main import main
+from vimgolf.trace import span, start_tracing, stop_tracing, traced
+
+
+@traced('work', 'test')
+def work(value):
+    with span('inner', 'test', value=value):
+        return value * 2
+
+
+def load_spans(path):
+    with open(path) as f:
+        events = json.load(f)['traceEvents']
+    return [event for event in events if event['ph'] == 'X']
+
+
+def test_trace(tmp_path):
+    path = str(tmp_path / 'trace.json')
+    # Nothing is recorded while tracing is off
+    assert work(1) == 2
+    start_tracing(path, 'root')
+    try:
+        assert work(2) == 4
+        thread = threading.Thread(target=work, args=(3,), name='other')
+        thread.start()
+        thread.join()
+        try:
+            with span('failing', 'test'):
+                raise ValueError()
+        except ValueError:
+            pass
+    finally:
+        stop_tracing()
+    assert vimgolf.trace._tracer is None
+    assert work(4) == 8
+
+    events = load_spans(path)
+    assert sorted((event['name'], event.get('args', {}).get('value')) for event in events) == [
+        ('failing', None), ('inner', 2), ('inner', 3), ('root', None), ('work', None), ('work', None),
+    ]
+    spans = {(event['name'], event.get('args', {}).get('value')): event for event in events}
+    root = spans['root', None]
+    for name in [('inner', 2), ('inner', 3), ('failing', None)]:
+        event = spans[name]
+        assert root['ts'] <= event['ts'] and event['ts'] + event['dur'] <= root['ts'] + root['dur']
+    assert spans['inner', 3]['tid'] != spans['inner', 2]['tid']
+    assert spans['failing', None]['args'] == {'error': 'ValueError'}
+
+
+def test_trace_option(tmp_path):
+    path = str(tmp_path / 'trace.json')
+    result = CliRunner().invoke(main, ['--trace', path, 'version'])
+    assert result.exit_code == 0
+    assert [event['name'] for event in load_spans(path)] == ['vimgolf version']
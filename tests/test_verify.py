@@ -0,0 +1,115 @@
+import importlib
+import json
+import os
+import shutil
+import time
+
+import pytest
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+import vimgolf.vim
+from vimgolf.challenge import Challenge
+from vimgolf.vim import SessionLimits
+from vimgolf.worker import WorkerPool
+
+verify_module = importlib.import_module('vimgolf.commands.verify')
+
+pytestmark = pytest.mark.skipif(shutil.which('vim') is None, reason='vim is not installed')
+
+IN_TEXT = 'one two\n'
+
+# keys -> (correct, score)
+SEQUENCES = {
+    '"adwZZ': (True, 6),
+    ':s/t/\\\\/<CR>ZZ': (False, 11),
+    'dwZZ': (True, 4),
+    # Doesn't quit, so it's saved and quit once its keys are processed
+    'dw': (True, 2),
+    'ZZ': (False, 2),
+}
+
+
+@pytest.fixture
+def workspace(tmp_path, monkeypatch):
+    monkeypatch.setattr(vimgolf.vim, 'VIMGOLF_EDITOR_CACHE_PATH', str(tmp_path / 'editor.json'))
+    monkeypatch.setattr(vimgolf.vim, '_editor', None)
+    workspace = tmp_path / 'workspace'
+    workspace.mkdir()
+    return str(workspace)
+
+
+def verify_all(workspace, out_text, pool=None):
+    challenge = Challenge('0' * 24, in_text=IN_TEXT, out_text=out_text, in_extension='.txt', out_extension='.txt')
+    outfile = os.path.join(workspace, 'out.txt')
+    with open(outfile, 'w') as f:
+        f.write(out_text)
+    results = {}
+    for index, keys in enumerate(SEQUENCES):
+        result = verify_module.verify_single(challenge, workspace, outfile, index, keys, pool=pool)
+        results[keys] = (result.get('correct'), result.get('score'))
+    return results
+
+
+def test_verify_cold_and_warm(workspace):
+    assert verify_all(workspace, 'two\n') == SEQUENCES
+    pool = WorkerPool(os.path.join(workspace, 'pool'), 1)
+    try:
+        assert verify_all(workspace, 'two\n', pool=pool) == SEQUENCES
+    finally:
+        pool.close()
+    # The sequences that quit vim didn't need a new worker
+    assert os.listdir(os.path.join(workspace, 'pool')) == ['worker0']
+
+
+@pytest.mark.parametrize('limits', [
+    SessionLimits(timeout=1, cpu=None, memory=None),
+    # The CPU limit applies first (Linux only)
+    pytest.param(SessionLimits(timeout=30, cpu=1, memory=512 * 1024 * 1024), marks=pytest.mark.skipif(
+        not hasattr(resource, 'prlimit'), reason='CPU limits are only applied on Linux')),
+])
+def test_verify_timeout(workspace, limits):
+    challenge = Challenge('0' * 24, in_text=IN_TEXT, out_text='two\n', in_extension='.txt', out_extension='.txt')
+    outfile = os.path.join(workspace, 'out.txt')
+    with open(outfile, 'w') as f:
+        f.write(challenge.out_text)
+    start = time.monotonic()
+    # A recursive macro, which never finishes
+    result = verify_module.verify_single(challenge, workspace, outfile, 0, 'qqix<Esc>@qq@q', limits=limits)
+    assert result['error'] == 'timeout'
+    assert time.monotonic() - start < 20
+
+
+def test_results_written_while_reading(workspace, monkeypatch):
+    challenge = Challenge('0' * 24, in_text=IN_TEXT, out_text='two\n', in_extension='.txt', out_extension='.txt')
+    outfile = os.path.join(workspace, 'out.txt')
+    with open(outfile, 'w') as f:
+        f.write(challenge.out_text)
+    written = []
+    monkeypatch.setattr(verify_module, 'write', written.append)
+
+    # The next sequence is only read once the first result is written
+    def sequences():
+        yield 0, 'dwZZ'
+        deadline = time.monotonic() + 10
+        while not written and time.monotonic() < deadline:
+            time.sleep(0.05)
+        assert written
+        yield 1, 'ZZ'
+
+    verify_module.verify_sequences(challenge, workspace, outfile, sequences(), 2, None, SessionLimits(30, None, None))
+    assert [json.loads(line)['correct'] for line in written] == [True, False]
+
+
+def test_failures_not_printed(workspace, capsys):
+    challenge = Challenge('0' * 24, in_text=IN_TEXT, out_text='two\n', in_extension='.txt', out_extension='.txt')
+    outfile = os.path.join(workspace, 'out.txt')
+    with open(outfile, 'w') as f:
+        f.write(challenge.out_text)
+    # Quits vim with an error code
+    result = verify_module.verify_single(challenge, workspace, outfile, 0, ':cq<CR>')
+    assert result['error'] == 'replay failed'
+    assert capsys.readouterr().err == ''
@@ -0,0 +1,88 @@
+import os
+import sys
+
+import vimgolf.vim
+from vimgolf.vim import get_editor, parse_features
+
+VIM_VERSION = '''\
+VIM - Vi IMproved 9.0 (2022 Jun 28, compiled Feb 16 2025 05:23:41)
+Included patches: 1-1378, 1499
+Huge version without GUI.  Features included (+) or not (-):
++acl               +file_in_path      -tcl
+++builtin_terms    +fork()            +timers
++channel           -clientserver      +job
++iconv/dyn         +python3/dyn       +lua/dyn
++terminal          +xterm_clipboard   -X11
+   system vimrc file: "$VIM/vimrc"
+Compilation: gcc -c -I. -Iproto +ignored
+'''
+
+NVIM_VERSION = '''\
+NVIM v0.9.5
+Build type: Release
+LuaJIT 2.1.1703358377
+
+Features: +acl +iconv +tui
+See ":help feature-compile"
+'''
+
+
+def test_parse_features():
+    assert parse_features(VIM_VERSION) == frozenset(
+        ['acl', 'file_in_path', 'builtin_terms', 'fork', 'timers', 'channel', 'job',
+         'iconv', 'python3', 'lua', 'terminal', 'xterm_clipboard'])
+    assert parse_features(NVIM_VERSION) == frozenset(['acl', 'iconv', 'tui'])
+
+
+def write_fake_vim(path, version):
+    with open(path, 'w') as f:
+        f.write('#!{}\n'.format(sys.executable))
+        # Counts the probes
+        f.write('open({!r}, "a").write("probe\\n")\n'.format('{}.calls'.format(path)))
+        f.write('print({!r}, end="")\n'.format(version))
+    os.chmod(path, 0o755)
+
+
+def calls(path):
+    with open('{}.calls'.format(path)) as f:
+        return len(f.readlines())
+
+
+def test_editor_cache(tmp_path, monkeypatch):
+    bin_path = tmp_path / 'bin'
+    bin_path.mkdir()
+    vim_path = str(bin_path / 'vim')
+    write_fake_vim(vim_path, VIM_VERSION)
+    monkeypatch.setenv('PATH', str(bin_path))
+    monkeypatch.setattr(vimgolf.vim, 'GOLF_VIM', 'vim')
+    monkeypatch.setattr(vimgolf.vim, 'VIMGOLF_EDITOR_CACHE_PATH', str(tmp_path / 'editor.json'))
+
+    def new_process_editor():
+        monkeypatch.setattr(vimgolf.vim, '_editor', None)
+        return get_editor()
+
+    editor = new_process_editor()
+    assert editor.path == vim_path
+    assert editor.name == 'vim'
+    assert editor.version == VIM_VERSION
+    assert editor.has('channel') and not editor.has('clientserver')
+    assert get_editor() is editor
+    assert calls(vim_path) == 1
+
+    # Cached on disk
+    assert new_process_editor() == editor
+    assert calls(vim_path) == 1
+
+    # Probed again once the executable changes
+    write_fake_vim(vim_path, NVIM_VERSION)
+    os.utime(vim_path, ns=(0, 0))
+    editor = new_process_editor()
+    assert editor.version == NVIM_VERSION
+    assert calls(vim_path) == 2
+
+    # ... or PATH does
+    monkeypatch.setenv('PATH', '{}{}{}'.format(tmp_path, os.pathsep, bin_path))
+    editor = new_process_editor()
+    assert calls(vim_path) == 3
+    assert new_process_editor() == editor
+    assert calls(vim_path) == 3
@@ -1,5 +1,3 @@
-import datetime
-import glob
 import logging
 import os
 
@@ -16,36 +14,97 @@ EXPANSION_PREFIX = '+'
 
 USER_HOME = os.path.expanduser('~')
 
-TIMESTAMP = datetime.datetime.utcnow().timestamp()
-
 # Max number of listings by default for 'vimgolf list'
 LISTING_LIMIT = 10
 
 # Max number of leaders to show for 'vimgolf show'
 LEADER_LIMIT = 3
 
-# Max number of existing logs to retain
-LOG_LIMIT = 10
+# Number of answers per page for 'vimgolf show'
+ANSWER_LIMIT = 10
+
+# The log is rotated once it reaches LOG_MAX_BYTES, and LOG_BACKUP_COUNT
+# rotated logs are retained
+LOG_MAX_BYTES = 1024 * 1024
+LOG_BACKUP_COUNT = 3
+
+# Level of the log, unless set by GOLF_LOG_LEVEL or by the log_level config file
+LOG_LEVEL = 'INFO'
 
 # Max number of parallel web requests.
 # As of 2018, most browsers use a max of six connections per hostname.
 MAX_REQUEST_WORKERS = 6
 
+# Web requests time out after HTTP_TIMEOUT seconds without progress, and failures
+# are retried up to HTTP_RETRIES times, waiting HTTP_BACKOFF seconds (doubled each time).
+HTTP_TIMEOUT = float(os.environ.get('GOLF_HTTP_TIMEOUT', 10))
+HTTP_RETRIES = 3
+HTTP_BACKOFF = 0.5
+
+# Deadlines for concurrent web requests (see vimgolf.fetch), in seconds: for each
+# request (with its retries), and for all the requests of 'vimgolf show' or 'vimgolf ls'.
+FETCH_TIMEOUT = 60
+FETCH_DEADLINE = 120
+
+# Cached web responses are used without a request for HTTP_CACHE_TTL seconds.
+# For HTTP_CACHE_STALE seconds after that, they're still used, and refreshed in the background.
+HTTP_CACHE_TTL = float(os.environ.get('GOLF_HTTP_CACHE_TTL', 5 * 60))
+HTTP_CACHE_STALE = 24 * 60 * 60
+# Max number of seconds that a command waits at exit for those refreshes to finish
+HTTP_CACHE_REVALIDATION_WAIT = 3
+
+# Bounds for the cache of web responses.
+# Least recently fetched responses are evicted first.
+HTTP_CACHE_MAX_BYTES = 128 * 1024 * 1024
+HTTP_CACHE_MAX_AGE = 30 * 24 * 60 * 60  # seconds
+
+# Max total size of the challenge specs downloaded in the background after 'vimgolf ls'
+PREFETCH_MAX_BYTES = 4 * 1024 * 1024
+# Max number of seconds that 'vimgolf ls' waits for those downloads, once the list is shown
+PREFETCH_DEADLINE = 2
+
+# Min number of seconds between the web requests of 'vimgolf sync', to be polite to vimgolf.com
+SYNC_REQUEST_INTERVAL = 0.25
+
+# Default number of parallel replay sessions for 'vimgolf verify'
+REPLAY_JOBS = os.cpu_count() or 1
+
+# Bounds for the cache of replayed steps ('vimgolf inspect').
+# Least recently used entries are evicted first.
+REPLAY_CACHE_MAX_BYTES = 256 * 1024 * 1024
+REPLAY_CACHE_MAX_AGE = 30 * 24 * 60 * 60  # seconds
+
+# Default limits for each headless replay session ('vimgolf inspect' and 'vimgolf verify'),
+# so that keys that never finish (e.g., a recursive macro) don't hang the command.
+REPLAY_TIMEOUT = 30  # seconds
+REPLAY_CPU_LIMIT = 30  # seconds
+REPLAY_MEMORY_LIMIT = 1024  # MiB of address space
+
+# How often the results of jobs sent to pooled vim workers are checked for
+WORKER_POLL_INTERVAL = 0.002  # seconds
+
 # Various paths
 PLAY_VIMRC_PATH = os.path.join(os.path.dirname(__file__), 'vimgolf.vimrc')
 INSPECT_VIM_PATH = os.path.join(os.path.dirname(__file__), 'vimgolf-inspect.vim')
+REPLAY_VIM_PATH = os.path.join(os.path.dirname(__file__), 'vimgolf-replay.vim')
+WORKER_VIM_PATH = os.path.join(os.path.dirname(__file__), 'vimgolf-worker.vim')
 CONFIG_HOME = os.environ.get('XDG_CONFIG_HOME', os.path.join(USER_HOME, '.config'))
 VIMGOLF_CONFIG_PATH = os.path.join(CONFIG_HOME, 'vimgolf')
 VIMGOLF_API_KEY_PATH = os.path.join(VIMGOLF_CONFIG_PATH, 'api_key')
+VIMGOLF_LOG_LEVEL_PATH = os.path.join(VIMGOLF_CONFIG_PATH, 'log_level')
 DATA_HOME = os.environ.get('XDG_DATA_HOME', os.path.join(USER_HOME, '.local', 'share'))
 VIMGOLF_DATA_PATH = os.path.join(DATA_HOME, 'vimgolf')
 VIMGOLF_ID_LOOKUP_PATH = os.path.join(VIMGOLF_DATA_PATH, 'id_lookup.json')
+VIMGOLF_DB_PATH = os.path.join(VIMGOLF_DATA_PATH, 'vimgolf.db')
 VIMGOLF_CHALLENGES_PATH = os.path.join(VIMGOLF_DATA_PATH, 'challenges')
+VIMGOLF_SYNC_STATE_PATH = os.path.join(VIMGOLF_DATA_PATH, 'sync.json')
 CACHE_HOME = os.environ.get('XDG_CACHE_HOME', os.path.join(USER_HOME, '.cache'))
 VIMGOLF_CACHE_PATH = os.path.join(CACHE_HOME, 'vimgolf')
 VIMGOLF_LOG_DIR_PATH = os.path.join(VIMGOLF_CACHE_PATH, 'log')
-VIMGOLF_LOG_FILENAME = 'vimgolf-{}-{}.log'.format(TIMESTAMP, os.getpid())
-VIMGOLF_LOG_PATH = os.path.join(VIMGOLF_LOG_DIR_PATH, VIMGOLF_LOG_FILENAME)
+VIMGOLF_REPLAY_CACHE_PATH = os.path.join(VIMGOLF_CACHE_PATH, 'replay')
+VIMGOLF_HTTP_CACHE_PATH = os.path.join(VIMGOLF_CACHE_PATH, 'http')
+VIMGOLF_EDITOR_CACHE_PATH = os.path.join(VIMGOLF_CACHE_PATH, 'editor.json')
+VIMGOLF_LOG_PATH = os.path.join(VIMGOLF_LOG_DIR_PATH, 'vimgolf.log')
 
 logger = logging.getLogger('vimgolf')
 
@@ -56,29 +115,15 @@ def setup_directories():
     os.makedirs(VIMGOLF_CHALLENGES_PATH, exist_ok=True)
     os.makedirs(VIMGOLF_CACHE_PATH, exist_ok=True)
     os.makedirs(VIMGOLF_LOG_DIR_PATH, exist_ok=True)
+    os.makedirs(VIMGOLF_REPLAY_CACHE_PATH, exist_ok=True)
+    os.makedirs(VIMGOLF_HTTP_CACHE_PATH, exist_ok=True)
 
 
 def init_logger():
-    logger.setLevel(logging.DEBUG)
-    handler = logging.FileHandler(VIMGOLF_LOG_PATH, mode='w')
-    handler.setLevel(logging.DEBUG)
-    formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
-    handler.setFormatter(formatter)
-    logger.addHandler(handler)
-
-
-def clean_stale_logs():
-    logger.info('cleaning stale logs')
-    existing_logs_glob = os.path.join(VIMGOLF_LOG_DIR_PATH, 'vimgolf-*-*.log')
-    existing_logs = glob.glob(existing_logs_glob)
-    log_sort_key = lambda x: float(os.path.basename(x).split('-')[1])
-    stale_existing_logs = sorted(existing_logs, key=log_sort_key)[:-LOG_LIMIT]
-    for log in stale_existing_logs:
-        logger.info('deleting stale log: {}'.format(log))
-        try:
-            os.remove(log)
-        except Exception:
-            logger.exception('error deleting stale log: {}'.format(log))
+    # Imported here, since logging.handlers (and the queue and threading
+    # modules) aren't needed by commands that run without the log
+    from vimgolf.log import start_logging
+    start_logging(logger, VIMGOLF_LOG_PATH)
 
 
 class Failure(Exception):
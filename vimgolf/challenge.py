@@ -2,14 +2,22 @@ import datetime
 import json
 import os
 import re
+import threading
 import urllib.parse
 
 from vimgolf import (
     VIMGOLF_ID_LOOKUP_PATH,
     EXPANSION_PREFIX,
     GOLF_HOST,
+    MAX_REQUEST_WORKERS,
+    PREFETCH_DEADLINE,
+    PREFETCH_MAX_BYTES,
     VIMGOLF_CHALLENGES_PATH,
+    logger,
 )
+from vimgolf.fetch import gather, run, FetchTimeout
+from vimgolf.store import get_store
+from vimgolf.trace import span, traced
 from vimgolf.utils import write, http_request, format_
 
 
@@ -45,14 +53,68 @@ def get_challenge_url(challenge_id):
     return urllib.parse.urljoin(GOLF_HOST, '/challenges/{}'.format(challenge_id))
 
 
+def get_challenge_spec_url(challenge_id):
+    return urllib.parse.urljoin(GOLF_HOST, '/challenges/{}.json'.format(challenge_id))
+
+
 def get_stored_challenges():
-    result = {}
-    for d in os.listdir(VIMGOLF_CHALLENGES_PATH):
-        full_path = os.path.join(VIMGOLF_CHALLENGES_PATH, d)
-        if not os.path.isdir(full_path):
-            continue
-        result[d] = Challenge(d)
-    return result
+    return {challenge_id: get_challenge(challenge_id) for challenge_id in get_store().challenge_ids()}
+
+
+_challenges = {}
+_challenges_lock = threading.Lock()
+
+
+def get_challenge(challenge_id):
+    """
+    The process-wide Challenge for challenge_id, so that its cached values
+    (see Challenge._cached) are shared by all the code that uses it.
+    """
+    with _challenges_lock:
+        challenge = _challenges.get(challenge_id)
+        if challenge is None:
+            challenge = _challenges[challenge_id] = Challenge(challenge_id)
+        return challenge
+
+
+def prefetch_specs(challenge_ids, max_bytes=PREFETCH_MAX_BYTES, deadline=PREFETCH_DEADLINE):
+    """
+    Download and save the specs of the challenges that aren't stored yet, in
+    parallel, so that they can be played later without waiting. No more
+    downloads are started once max_bytes have been received, or past deadline
+    (in seconds), when the pending ones are abandoned (see vimgolf.fetch).
+    Returns the number of specs saved.
+    """
+    challenges = [get_challenge(challenge_id) for challenge_id in challenge_ids]
+    challenges = [challenge for challenge in challenges if not challenge.spec]
+    remaining = iter(challenges)
+    received = 0
+
+    # Each worker downloads a spec at a time, so that no more are started past max_bytes
+    async def prefetch_worker(fetcher):
+        nonlocal received
+        saved = 0
+        for challenge in remaining:
+            if received >= max_bytes:
+                break
+            try:
+                response = await fetcher.fetch(get_challenge_spec_url(challenge.id))
+                received += len(response.body.encode('utf-8'))
+                challenge.save(json.loads(response.body))
+                saved += 1
+            except FetchTimeout:
+                break
+            except Exception:
+                logger.exception('challenge prefetch failed: {}'.format(challenge.id))
+        return saved
+
+    async def prefetch_all(fetcher):
+        return await gather(*[prefetch_worker(fetcher) for _ in range(MAX_REQUEST_WORKERS)])
+
+    if not challenges:
+        return 0
+    logger.info('prefetching {} challenge specs'.format(len(challenges)))
+    return sum(run(prefetch_all, per_host=MAX_REQUEST_WORKERS, deadline=deadline))
 
 
 class Challenge:
@@ -72,6 +134,8 @@ class Challenge:
         self.id = id
         self.compliant = compliant
         self.api_key = api_key
+        # name -> (store version, value), see _cached
+        self._cache = {}
 
     def load_or_download(self):
         if self.spec:
@@ -79,13 +143,14 @@ class Challenge:
         else:
             return self.download()
 
+    @traced('Challenge.load', 'disk')
     def load(self):
         self.load_from_spec(self.spec)
         return self
 
+    @traced('Challenge.download', 'challenge')
     def download(self):
-        url = urllib.parse.urljoin(GOLF_HOST, '/challenges/{}.json'.format(self.id))
-        response = http_request(url)
+        response = http_request(get_challenge_spec_url(self.id))
         challenge_spec = json.loads(response.body)
         self.save(challenge_spec)
         return self
@@ -107,10 +172,6 @@ class Challenge:
     def dir(self):
         return os.path.join(VIMGOLF_CHALLENGES_PATH, self.id)
 
-    @property
-    def spec_path(self):
-        return os.path.join(self.dir, 'spec.json')
-
     @property
     def in_path(self):
         return os.path.join(self.dir, 'in{}'.format(self.in_extension))
@@ -119,14 +180,7 @@ class Challenge:
     def out_path(self):
         return os.path.join(self.dir, 'out{}'.format(self.out_extension))
 
-    @property
-    def answers_path(self):
-        return os.path.join(self.dir, 'answers.jsonl')
-
-    @property
-    def metadata_path(self):
-        return os.path.join(self.dir, 'metadata.json')
-
+    @traced('Challenge.save', 'disk')
     def save(self, spec):
         self.load_from_spec(spec)
         self._ensure_dir()
@@ -134,73 +188,64 @@ class Challenge:
             f.write(self.in_text)
         with open(self.out_path, 'w') as f:
             f.write(self.out_text)
-        with open(self.spec_path, 'w') as f:
-            json.dump(spec, f)
+        get_store().save_spec(self.id, spec)
 
+    @traced('Challenge.add_answer', 'disk')
     def add_answer(self, keys, correct, score, uploaded):
-        self._ensure_dir()
-        with open(self.answers_path, 'a') as f:
-            f.write('{}\n'.format(json.dumps({
-                'keys': keys,
-                'correct': correct,
-                'score': score,
-                'uploaded': uploaded,
-                'timestamp': datetime.datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%S')
-            })))
+        get_store().add_answer(self.id, {
+            'keys': keys,
+            'correct': correct,
+            'score': score,
+            'uploaded': uploaded,
+            'timestamp': datetime.datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%S')
+        })
 
+    # The values of answers, spec and metadata are cached, and shouldn't be modified.
     @property
     def answers(self):
-        if not os.path.exists(self.answers_path):
-            return []
-        result = []
-        with open(self.answers_path) as f:
-            for raw_answer in f:
-                result.append(json.loads(raw_answer))
-        return sorted(result, key=lambda a: a['timestamp'])
+        return self._cached('answers', lambda: get_store().get_answers(self.id))
+
+    def iter_answers(self, **kwargs):
+        """Generate answers without loading them all (see Store.iter_answers for kwargs)."""
+        return get_store().iter_answers(self.id, **kwargs)
 
     @property
     def spec(self):
-        if not os.path.exists(self.spec_path):
-            return {}
-        with open(self.spec_path) as f:
-            return json.load(f)
+        return self._cached('spec', lambda: get_store().get_spec(self.id) or {})
 
     @property
     def metadata(self):
-        if not os.path.exists(self.metadata_path):
-            return {}
-        with open(self.metadata_path) as f:
-            return json.load(f)
+        return self._cached('metadata', self._load_metadata)
 
-    def update_metadata(self, name=None, description=None):
-        self._ensure_dir()
-        answers = 0
-        uploaded = 0
-        correct = 0
-        stub_score = 10 ** 10
-        best_score = stub_score
-        for answer in self.answers:
-            answers += 1
-            if answer['uploaded']:
-                uploaded += 1
-            if answer['correct']:
-                correct += 1
-                best_score = min(best_score, answer['score'])
-        current_metadata = self.metadata
-        current_metadata.update({
+    def _load_metadata(self):
+        metadata = get_store().get_metadata(self.id)
+        if metadata is None:
+            return {}
+        metadata.update({
             'id': self.id,
             'url': get_challenge_url(self.id),
-            'uploaded': uploaded,
-            'correct': correct,
-            'answers': answers,
-            'best_score': best_score if best_score != stub_score else -1,
         })
-        if name:
-            current_metadata['name'] = name
-        if description:
-            current_metadata['description'] = description
-        with open(self.metadata_path, 'w') as f:
-            json.dump(current_metadata, f)
+        return metadata
+
+    def _cached(self, name, load):
+        """Value of load(), which is called again only once the store has changed."""
+        version = get_store().version()
+        cached = self._cache.get(name)
+        if cached is None or cached[0] != version:
+            with span('Challenge.{}'.format(name), 'disk'):
+                cached = self._cache[name] = (version, load())
+        return cached[1]
+
+    @traced('Challenge.update_metadata', 'disk')
+    def update_metadata(self, name=None, description=None):
+        # Answer stats are updated by add_answer (see 'vimgolf reindex' to rebuild them)
+        metadata = self.metadata
+        changed = (name and metadata.get('name') != name) or (
+            description and metadata.get('description') != description)
+        if not changed:
+            # Unchanged, so the store isn't written (e.g., by each 'vimgolf show')
+            return
+        get_store().update_metadata(self.id, name=name, description=description)
 
     def _ensure_dir(self):
         if not os.path.exists(self.dir):
@@ -1,6 +1,50 @@
-from .config import config
-from .local import local
-from .ls import ls
-from .put import put
-from .show import show
-from .inspect import inspect
+"""The commands, each in the module of the same name.
+
+A command's module is only imported once the command is used (e.g.,
+commands.ls), so that the CLI doesn't load the modules (and dependencies)
+of the other commands.
+"""
+
+import importlib
+import sys
+import types
+
+COMMAND_NAMES = [
+    'config',
+    'local',
+    'ls',
+    'put',
+    'show',
+    'inspect',
+    'verify',
+    'reindex',
+    'sync',
+]
+
+
+class _Command:
+    """Package attribute for a command, importing its module on first use."""
+
+    def __init__(self, name):
+        self.name = name
+
+    def __get__(self, package, owner=None):
+        if package is None:
+            return self
+        module = importlib.import_module('{}.{}'.format(package.__name__, self.name))
+        return getattr(module, self.name)
+
+    def __set__(self, package, value):
+        # Importing a command's module sets the module as an attribute of the
+        # package, and the command is kept instead (e.g., commands.ls stays a function).
+        pass
+
+
+class _Commands(types.ModuleType):
+    pass
+
+
+for _name in COMMAND_NAMES:
+    setattr(_Commands, _name, _Command(_name))
+
+sys.modules[__name__].__class__ = _Commands
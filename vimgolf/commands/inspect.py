@@ -1,25 +1,21 @@
-import filecmp
 import os
-import shutil
 import tempfile
 
 from vimgolf import logger, Failure, INSPECT_VIM_PATH
 from vimgolf.challenge import (
-    Challenge,
+    get_challenge,
     expand_challenge_id,
     validate_challenge_id,
     show_challenge_id_error,
 )
-from vimgolf.keys import (
-    tokenize_raw_keycode_reprs,
-    REPLAY_QUIT,
-    KeycodeReprs,
-)
+from vimgolf.keys import KeycodeReprs
+from vimgolf.replay import replay, snapshot_path
+from vimgolf.replay_cache import get_cache_dir, get_store, ReplayTrie, evict
 from vimgolf.utils import write
-from vimgolf.vim import vim, BASE_ARGS
+from vimgolf.vim import vim, get_editor, BASE_ARGS, NO_LIMITS, SessionTimeout
 
 
-def inspect(challenge_id, keys, literal_lt, literal_gt):
+def inspect(challenge_id, keys, literal_lt, literal_gt, limits=NO_LIMITS):
     challenge_id = expand_challenge_id(challenge_id)
     logger.info('inspect(%s)', challenge_id)
 
@@ -28,7 +24,7 @@ def inspect(challenge_id, keys, literal_lt, literal_gt):
         raise Failure()
 
     try:
-        challenge = Challenge(challenge_id)
+        challenge = get_challenge(challenge_id)
         challenge.load_or_download()
     except Failure:
         raise
@@ -50,80 +46,99 @@ def inspect(challenge_id, keys, literal_lt, literal_gt):
     with tempfile.TemporaryDirectory() as workspace:
         zfill = lambda s: str(s).zfill(3)
 
-        def dst_path(index):
-            return os.path.join(workspace, '{}{}{}'.format(name, zfill(index), ext))
+        cache_dir = get_cache_dir(challenge_id, src_in_path, get_editor().version)
 
-        def script_path(index):
-            return os.path.join(workspace, 'mapping{}.vim'.format(zfill(index)))
+        def dst_path(digest):
+            return snapshot_path(get_store(cache_dir), digest)
 
         def in_path(index):
             return os.path.join(workspace, 'inspect-{}{}{}'.format(name, zfill(index), ext))
 
-        replay_sequences(
-            dst_path=dst_path,
-            script_path=script_path,
-            sequences=sequences,
-            src_in_path=src_in_path
-        )
-        inspect_sequences(
+        try:
+            steps = replay_sequences(
+                workspace=workspace,
+                cache_dir=cache_dir,
+                sequences=sequences,
+                src_in_path=src_in_path,
+                limits=limits,
+            )
+        except SessionTimeout:
+            write('The replay of the keys has timed out', err=True, fg='red')
+            write('The keys may never finish (e.g., a recursive macro), '
+                  'or the limits may be too low', err=True, fg='red')
+            raise Failure()
+        inspect_pairs_path = prepare_inspect(
             workspace=workspace,
             dst_path=dst_path,
             in_path=in_path,
-            sequences=sequences
+            sequences=sequences,
+            steps=steps,
         )
+        # The snapshots were copied to the inspect files, and the entry in use is kept
+        try:
+            evict(keep=cache_dir)
+        except Exception:
+            logger.exception('replay cache eviction failed')
+        vim(BASE_ARGS + [
+            '-S', INSPECT_VIM_PATH,
+            '-S', inspect_pairs_path,
+        ], check=True)
 
 
 def build_sequences(keys, literal_gt, literal_lt):
-    tokens = tokenize_raw_keycode_reprs(
-        raw_keycode_reprs=keys,
+    keycode_reprs = KeycodeReprs(
+        keys,
         literal_lt=literal_lt,
-        literal_gt=literal_gt,
+        literal_gt=literal_gt
     )
-    return [
-        KeycodeReprs(
-            ''.join(tokens[:i]),
-            literal_lt=literal_lt,
-            literal_gt=literal_gt
-        )
-        for i in range(len(tokens) + 1)
-    ]
-
-
-def replay_sequences(dst_path, script_path, sequences, src_in_path):
-    for i, keycode_reprs in enumerate(sequences):
-        shutil.copy(src_in_path, dst_path(i))
-        all_keycodes = keycode_reprs + REPLAY_QUIT
-        with open(script_path(i), 'w') as f:
-            f.write(all_keycodes.call_feedkeys)
-        vim(BASE_ARGS + [
-            '-S', script_path(i),
-            dst_path(i),
-        ], check=True)
+    return [keycode_reprs.prefix(i) for i in range(len(keycode_reprs) + 1)]
+
+
+def replay_sequences(workspace, cache_dir, sequences, src_in_path, limits=NO_LIMITS):
+    # sequences[i] is the prefix of the last sequence made of its first i tokens,
+    # so a replay of the last sequence visits all of them in order.
+    # Steps for the longest prefix replayed by a previous run are taken from the cache.
+    # The editor state can't be restored from a snapshot though, so the replay still
+    # goes through the keys of that prefix, skipping their snapshots.
+    # This is a single replay, so a WorkerPool (as used by verify) wouldn't save
+    # a vim startup: its worker would have to start first as well.
+    tokens = sequences[-1].tokens
+    trie = ReplayTrie.load(cache_dir)
+    cached_steps = trie.lookup(tokens)
+    logger.info('replay cache hits: %s/%s', len(cached_steps), len(sequences))
+    steps = cached_steps + replay(
+        src_in_path=src_in_path,
+        tokens=tokens,
+        workspace=workspace,
+        store=get_store(cache_dir),
+        start=len(cached_steps),
+        limits=limits,
+    )
+    trie.insert(tokens, steps)
+    trie.save(cache_dir)
+    return steps
 
 
-def inspect_sequences(workspace, dst_path, in_path, sequences):
-    in_sequences = find_interesting_sequences(dst_path, sequences)
+def prepare_inspect(workspace, dst_path, in_path, sequences, steps):
+    """Write the inspect files of the interesting steps, returning the path of the script comparing them."""
+    in_sequences = find_interesting_sequences(steps)
 
     prepare_inspect_files(
         in_path=in_path,
         dst_path=dst_path,
         sequences=sequences,
         in_sequences=in_sequences,
+        steps=steps,
     )
 
-    inspect_pairs_path = build_inspect_pairs(
+    return build_inspect_pairs(
         in_path=in_path,
         in_sequences=in_sequences,
         workspace=workspace,
     )
 
-    vim(BASE_ARGS + [
-        '-S', INSPECT_VIM_PATH,
-        '-S', inspect_pairs_path,
-    ], check=True)
-
 
-def prepare_inspect_files(dst_path, in_path, in_sequences, sequences):
+def prepare_inspect_files(dst_path, in_path, in_sequences, sequences, steps):
     for i, in_sequence_index in enumerate(in_sequences):
         with open(in_path(i), 'wb') as in_f:
             if in_sequence_index == 0:
@@ -134,7 +149,7 @@ def prepare_inspect_files(dst_path, in_path, in_sequences, sequences):
                     reprs = '{} (OUT)'.format(reprs)
             header = '{}\n----------------------\n'.format(reprs)
             in_f.write(bytes(header, 'utf-8'))
-            with open(dst_path(in_sequence_index), 'rb') as dst_f:
+            with open(dst_path(steps[in_sequence_index].digest), 'rb') as dst_f:
                 in_f.write(dst_f.read())
 
 
@@ -154,11 +169,11 @@ def build_inspect_pairs(in_path, in_sequences, workspace):
     return inspect_pairs_path
 
 
-def find_interesting_sequences(dst_path, sequences):
-    last_sequence = len(sequences) - 1
+def find_interesting_sequences(steps):
+    last_sequence = len(steps) - 1
     in_sequences = [0]
-    for i in range(len(sequences) - 1):
-        if not filecmp.cmp(dst_path(i), dst_path(i + 1)):
+    for i in range(len(steps) - 1):
+        if steps[i].digest != steps[i + 1].digest:
             in_sequences.append(i + 1)
     if last_sequence not in in_sequences:
         in_sequences.append(last_sequence)
@@ -5,31 +5,33 @@ from terminaltables import AsciiTable
 
 from vimgolf import (
     LISTING_LIMIT,
+    FETCH_DEADLINE,
     logger,
     GOLF_HOST,
     EXPANSION_PREFIX,
     Failure,
 )
-from vimgolf.challenge import get_stored_challenges, set_id_lookup
+from vimgolf.challenge import get_stored_challenges, prefetch_specs, set_id_lookup
 from vimgolf.html import (
-    parse_html,
-    get_elements_by_classname,
-    get_elements_by_tagname,
+    extract,
+    get_text,
+    has_class,
+    select,
     NodeType,
+    SubtreeParser,
 )
-from vimgolf.utils import http_request, write, style, bool_to_mark
+from vimgolf.fetch import fetch_all
+from vimgolf.http_cache import is_offline
+from vimgolf.utils import write, style, bool_to_mark
 
 Listing = namedtuple('Listing', 'id name n_entries uploaded score answers')
 
 
-def ls(incomplete=False, page=None, limit=LISTING_LIMIT):
+def ls(incomplete=False, page=None, limit=LISTING_LIMIT, prefetch=True):
     logger.info('list_(%s, %s)', page, limit)
     stored_challenges = get_stored_challenges()
     try:
-        url = GOLF_HOST
-        if page is not None:
-            url = urllib.parse.urljoin(GOLF_HOST, '/?page={}'.format(page))
-        response = http_request(url)
+        response, = fetch_all([get_listing_url(page)], deadline=FETCH_DEADLINE)
         listings = extract_listings_from_page(
             page_html=response.body,
             limit=limit,
@@ -62,37 +64,61 @@ def ls(incomplete=False, page=None, limit=LISTING_LIMIT):
     id_lookup = {str(idx+1): listing.id for idx, listing in enumerate(listings)}
     set_id_lookup(id_lookup)
 
+    # The table is already shown, and the specs are downloaded so that the
+    # listed challenges can then be played (e.g., 'vimgolf put +1') without waiting.
+    # This is bounded by PREFETCH_DEADLINE, so that ls itself doesn't wait long.
+    if prefetch and not is_offline():
+        prefetch_specs([listing.id for listing in listings])
+
+
+def get_listing_url(page=None):
+    if page is None:
+        return GOLF_HOST
+    return urllib.parse.urljoin(GOLF_HOST, '/?page={}'.format(page))
+
 
 def extract_listings_from_page(page_html, limit, stored_challenges):
-    nodes = parse_html(page_html)
-    listings = []
-    challenge_elements = get_elements_by_classname(nodes, 'challenge')
-    for element in challenge_elements:
-        if len(listings) >= limit:
+    parser = extract(ListingParser(limit), page_html)
+    return [listing_from_element(element, stored_challenges) for element in parser.elements]
+
+
+class ListingParser(SubtreeParser):
+    """Collects the first limit .challenge elements, and skips the rest of the page."""
+
+    def __init__(self, limit):
+        SubtreeParser.__init__(self)
+        self.limit = limit
+        self.elements = []
+        self.done = limit <= 0
+
+    def is_root(self, tag, attrs):
+        return has_class(attrs, 'challenge')
+
+    def handle_subtree(self, element):
+        self.elements.append(element)
+        self.done = len(self.elements) >= self.limit
+
+
+def listing_from_element(element, stored_challenges):
+    anchor = select(element, '> a')[0]
+    href = anchor.get_attr('href')
+    id_ = href.split('/')[-1]
+    name = get_text(anchor.children)
+    n_entries = None
+    for child in element.children:
+        if child.node_type == NodeType.TEXT and 'entries' in child.data:
+            n_entries = int([x for x in child.data.split() if x.isdigit()][0])
             break
-        anchor = get_elements_by_tagname(element.children, 'a')[0]
-        href = anchor.get_attr('href')
-        id_ = href.split('/')[-1]
-        name = anchor.children[0].data
-        n_entries = None
-        for child in element.children:
-            if child.node_type == NodeType.TEXT and 'entries' in child.data:
-                n_entries = int([x for x in child.data.split() if x.isdigit()][0])
-                break
-        stored_challenge = stored_challenges.get(id_)
-        if stored_challenge:
-            stored_challenge.update_metadata()
-        stored_metadata = stored_challenge.metadata if stored_challenge else {}
-        listing = Listing(
-            id=id_,
-            name=name,
-            n_entries=n_entries,
-            uploaded=stored_metadata.get('uploaded'),
-            score=stored_metadata.get('best_score'),
-            answers=stored_metadata.get('answers'),
-        )
-        listings.append(listing)
-    return listings
+    stored_challenge = stored_challenges.get(id_)
+    stored_metadata = stored_challenge.metadata if stored_challenge else {}
+    return Listing(
+        id=id_,
+        name=name,
+        n_entries=n_entries,
+        uploaded=stored_metadata.get('uploaded'),
+        score=stored_metadata.get('best_score'),
+        answers=stored_metadata.get('answers'),
+    )
 
 
 def parse_list_spec(raw_spec):
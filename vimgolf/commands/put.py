@@ -11,7 +11,7 @@ from vimgolf.challenge import (
     expand_challenge_id,
     validate_challenge_id,
     show_challenge_id_error,
-    Challenge,
+    get_challenge,
 )
 from vimgolf.play import play
 from vimgolf.utils import write, confirm
@@ -43,19 +43,17 @@ def put(challenge_id, keys, diff=False):
         write('Please check the challenge ID on vimgolf.com', err=True, fg='red')
         raise Failure()
 
-    challenge = Challenge(
-        id=challenge_id,
-        compliant=compliant,
-        api_key=api_key
-    ).load()
+    challenge = get_challenge(challenge_id)
+    challenge.compliant = compliant
+    challenge.api_key = api_key
+    challenge.load()
     with tempfile.TemporaryDirectory() as d:
         play(challenge, d, keys=keys, diff=diff)
-    challenge.update_metadata()
 
 
 def fetch_and_validate_challenge(challenge_id):
     write('Downloading vimgolf challenge {}'.format(challenge_id), fg='yellow')
-    challenge = Challenge(challenge_id)
+    challenge = get_challenge(challenge_id)
     challenge.load_or_download()
     challenge_spec = challenge.spec
     compliant = challenge_spec.get('client') == RUBY_CLIENT_VERSION_COMPLIANCE
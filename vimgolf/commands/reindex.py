@@ -0,0 +1,14 @@
+from vimgolf import logger, Failure
+from vimgolf.store import get_store
+from vimgolf.utils import write
+
+
+def reindex():
+    logger.info('reindex()')
+    try:
+        count = get_store().reindex()
+    except Exception:
+        logger.exception('reindex failed')
+        write('The reindex of the stored challenges has failed', err=True, fg='red')
+        raise Failure()
+    write('Reindexed {} challenges'.format(count), fg='green')
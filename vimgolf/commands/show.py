@@ -1,15 +1,13 @@
-import concurrent.futures
 import json
-import urllib.parse
 from collections import namedtuple
 
 from terminaltables import AsciiTable
 
 from vimgolf import (
     logger,
-    GOLF_HOST,
-    MAX_REQUEST_WORKERS,
+    FETCH_DEADLINE,
     LEADER_LIMIT,
+    ANSWER_LIMIT,
     Failure,
 )
 from vimgolf.challenge import (
@@ -17,19 +15,21 @@ from vimgolf.challenge import (
     validate_challenge_id,
     show_challenge_id_error,
     get_challenge_url,
-    Challenge,
+    get_challenge_spec_url,
+    get_challenge,
 )
+from vimgolf.fetch import fetch_all
 from vimgolf.html import (
-    parse_html,
-    get_element_by_id,
-    get_elements_by_classname,
-    get_elements_by_tagname,
+    extract,
     get_text,
+    has_class,
+    select,
+    SubtreeParser,
 )
-from vimgolf.utils import http_request, join_lines, write, bool_to_mark
+from vimgolf.utils import join_lines, write, bool_to_mark
 
 
-def show(challenge_id):
+def show(challenge_id, answer_limit=ANSWER_LIMIT, page=1):
     challenge_id = expand_challenge_id(challenge_id)
     logger.info('show(%s)', challenge_id)
 
@@ -88,7 +88,13 @@ def show(challenge_id):
         write('Uploaded: {}'.format(metadata['uploaded']))
         write('Correct Solutions: {}'.format(metadata['correct']))
         write('Self Best Score: {}'.format(metadata['best_score']))
-        answers = challenge.answers
+        # Pages are counted from the newest answers, and each is shown oldest first
+        answers = list(challenge.iter_answers(
+            newest_first=True,
+            limit=answer_limit or None,
+            offset=(page - 1) * answer_limit,
+        ))
+        answers.reverse()
         ignored_answer_suffix = 'ZQ'
         answer_rows = [['Keys', 'Correct', 'Submitted', 'Score', 'Timestamp']]
         for answer in answers:
@@ -105,6 +111,8 @@ def show(challenge_id):
             answer_rows.append(answer_row)
         if len(answer_rows) > 1:
             write(AsciiTable(answer_rows).table)
+        if answer_limit and metadata['answers'] > page * answer_limit:
+            write('Older answers: --page {}'.format(page + 1), fg='yellow')
     except Failure:
         raise
     except Exception:
@@ -115,22 +123,19 @@ def show(challenge_id):
 
 
 def fetch_challenge_spec_and_page(challenge_id):
-    challenge = Challenge(challenge_id)
+    challenge = get_challenge(challenge_id)
     challenge_spec = challenge.spec
-    api_url = urllib.parse.urljoin(GOLF_HOST, '/challenges/{}.json'.format(challenge_id))
     page_url = get_challenge_url(challenge_id)
-    with concurrent.futures.ThreadPoolExecutor(max_workers=MAX_REQUEST_WORKERS) as executor:
-        requests = [page_url]
-        if not challenge_spec:
-            requests.append(api_url)
-        results = executor.map(http_request, requests)
-        page_response = next(results)
-        if not challenge_spec:
-            api_response = next(results)
-            challenge_spec = json.loads(api_response.body)
-            challenge.save(challenge_spec)
-        else:
-            challenge.load()
+    urls = [page_url]
+    if not challenge_spec:
+        urls.append(get_challenge_spec_url(challenge_id))
+    responses = fetch_all(urls, deadline=FETCH_DEADLINE)
+    page_response = responses[0]
+    if not challenge_spec:
+        challenge_spec = json.loads(responses[1].body)
+        challenge.save(challenge_spec)
+    else:
+        challenge.load()
     return {
         'challenge': challenge,
         'page': page_response,
@@ -139,24 +144,24 @@ def fetch_challenge_spec_and_page(challenge_id):
 
 
 def extract_data_from_page(page_html):
-    nodes = parse_html(page_html)
-    content_element = get_element_by_id(nodes, 'content')
-    content_grid_7_element = get_elements_by_classname(content_element.children, 'grid_7')[0]
-    name_h3 = get_elements_by_tagname(content_grid_7_element.children, 'h3')[0]
+    parser = extract(ChallengePageParser(), page_html)
+    content_grid_7_element = parser.columns['grid_7']
+    content_grid_5_element = parser.columns['grid_5']
+    if content_grid_7_element is None or content_grid_5_element is None:
+        raise ValueError('challenge page without content')
+    name_h3 = select(content_grid_7_element, '> h3')[0]
     name = join_lines(get_text([name_h3]).strip())
-    description_p_element = get_elements_by_tagname(content_grid_7_element.children, 'p')[0]
+    description_p_element = select(content_grid_7_element, '> p')[0]
     description = join_lines(get_text([description_p_element]).strip())
-    content_grid_5_element = get_elements_by_classname(content_element.children, 'grid_5')[0]
     Leader = namedtuple('Leader', 'username score')
     leaders = []
-    leaderboard_divs = get_elements_by_tagname(content_grid_5_element.children, 'div')
-    for leaderboard_div in leaderboard_divs:
-        user_h6 = get_elements_by_tagname(leaderboard_div.children, 'h6')[0]
-        username_anchor = get_elements_by_tagname(user_h6.children, 'a')[1]
+    for leaderboard_div in select(content_grid_5_element, '> div'):
+        # The first anchor is the avatar
+        username_anchor = select(leaderboard_div, '> h6 > a')[1]
         username = get_text([username_anchor]).strip()
         if username.startswith('@'):
             username = username[1:]
-        score_div = get_elements_by_tagname(leaderboard_div.children, 'div')[0]
+        score_div = select(leaderboard_div, '> div')[0]
         score = int(get_text([score_div]).strip())
         leader = Leader(username=username, score=score)
         leaders.append(leader)
@@ -165,3 +170,26 @@ def extract_data_from_page(page_html):
         'description': description,
         'leaders': leaders
     }
+
+
+class ChallengePageParser(SubtreeParser):
+    """
+    Collects the columns of #content: .grid_7 (name and description) and
+    .grid_5 (leaderboard), and skips the rest of the page.
+    """
+
+    def __init__(self):
+        SubtreeParser.__init__(self)
+        self.columns = {'grid_7': None, 'grid_5': None}
+
+    def is_root(self, tag, attrs):
+        if not self.ancestors or ('id', 'content') not in self.ancestors[-1][1]:
+            return False
+        return any(self.columns[name] is None and has_class(attrs, name) for name in self.columns)
+
+    def handle_subtree(self, element):
+        for name in self.columns:
+            if self.columns[name] is None and element.has_class(name):
+                self.columns[name] = element
+                break
+        self.done = all(column is not None for column in self.columns.values())
@@ -0,0 +1,121 @@
+import json
+import os
+import sys
+
+from vimgolf import (
+    logger,
+    Failure,
+    MAX_REQUEST_WORKERS,
+    SYNC_REQUEST_INTERVAL,
+    VIMGOLF_SYNC_STATE_PATH,
+)
+from vimgolf.challenge import get_challenge, get_challenge_spec_url
+from vimgolf.commands.ls import extract_listings_from_page, get_listing_url
+from vimgolf.fetch import gather, run
+from vimgolf.utils import write
+
+
+def sync(jobs=MAX_REQUEST_WORKERS, interval=SYNC_REQUEST_INTERVAL, restart=False):
+    """
+    Crawl all the listing pages, and download the specs of the challenges that
+    aren't stored yet, or whose number of entries changed since the last sync.
+    The progress is saved after each page, so that an interrupted sync resumes
+    where it stopped.
+    """
+    logger.info('sync(%s, %s, %s)', jobs, interval, restart)
+    state = SyncState.load(VIMGOLF_SYNC_STATE_PATH)
+    if restart:
+        state.next_page = 1
+    syncer = Syncer(state)
+    try:
+        run(syncer.run, per_host=jobs, interval=interval)
+    except Failure:
+        raise
+    except Exception:
+        logger.exception('sync failed')
+        write('The sync has failed, run it again to resume (page {})'.format(state.next_page),
+              err=True, fg='red')
+        raise Failure()
+    write('Synced {} challenges: {} downloaded, {} unchanged, {} failed'.format(
+        syncer.seen, syncer.downloaded, syncer.unchanged, syncer.failed), fg='green')
+    if syncer.failed:
+        write('See the log for the failures, and run sync again to retry them', fg='yellow')
+
+
+class SyncState:
+    def __init__(self, path, next_page=1, entries=None):
+        self.path = path
+        # The first page that hasn't been fully synced (1 once a crawl is done)
+        self.next_page = next_page
+        # challenge ID -> number of entries when its spec was last saved
+        self.entries = entries or {}
+
+    @classmethod
+    def load(cls, path):
+        if not os.path.exists(path):
+            return cls(path)
+        try:
+            with open(path) as f:
+                raw_state = json.load(f)
+            return cls(path, next_page=raw_state['next_page'], entries=raw_state['entries'])
+        except (ValueError, KeyError):
+            logger.exception('sync state load failed: {}'.format(path))
+            return cls(path)
+
+    def save(self):
+        tmp_path = '{}.{}.tmp'.format(self.path, os.getpid())
+        with open(tmp_path, 'w') as f:
+            json.dump({'next_page': self.next_page, 'entries': self.entries}, f)
+        os.replace(tmp_path, self.path)
+
+
+class Syncer:
+    def __init__(self, state):
+        self.state = state
+        self.seen = 0
+        self.downloaded = 0
+        self.unchanged = 0
+        self.failed = 0
+
+    async def run(self, fetcher):
+        if self.state.next_page > 1:
+            write('Resuming from page {}'.format(self.state.next_page))
+        seen_ids = set()
+        while True:
+            page = self.state.next_page
+            response = await fetcher.fetch(get_listing_url(page))
+            listings = extract_listings_from_page(
+                page_html=response.body,
+                limit=sys.maxsize,
+                stored_challenges={},
+            )
+            # Past the last page, the site may return an empty page, or the last page again
+            listings = [listing for listing in listings if listing.id not in seen_ids]
+            if not listings:
+                break
+            seen_ids.update(listing.id for listing in listings)
+            downloaded = sum(await gather(*[self.sync_challenge(fetcher, listing) for listing in listings]))
+            write('Page {}: {} challenges, {} downloaded'.format(page, len(listings), downloaded))
+            self.state.next_page = page + 1
+            self.state.save()
+        self.state.next_page = 1
+        self.state.save()
+
+    async def sync_challenge(self, fetcher, listing):
+        """Download and save the spec of the listed challenge if needed, returning whether it was."""
+        challenge = get_challenge(listing.id)
+        self.seen += 1
+        if challenge.spec and self.state.entries.get(listing.id) == listing.n_entries:
+            self.unchanged += 1
+            return False
+        try:
+            response = await fetcher.fetch(get_challenge_spec_url(listing.id))
+            challenge.save(json.loads(response.body))
+            challenge.update_metadata(name=listing.name)
+        except Exception:
+            logger.exception('challenge sync failed: {}'.format(listing.id))
+            self.failed += 1
+            return False
+        self.state.entries[listing.id] = listing.n_entries
+        self.downloaded += 1
+        return True
@@ -0,0 +1,141 @@
+import concurrent.futures
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+from vimgolf import logger, Failure, REPLAY_JOBS
+from vimgolf.challenge import (
+    get_challenge,
+    expand_challenge_id,
+    validate_challenge_id,
+    show_challenge_id_error,
+)
+from vimgolf.keys import KeycodeReprs, REPLAY_QUIT
+from vimgolf.play import play_single, play_pooled
+from vimgolf.utils import write
+from vimgolf.vim import get_editor, NO_LIMITS, SessionTimeout
+from vimgolf.worker import WorkerPool
+
+
+def verify(challenge_id, keys_file, jobs=REPLAY_JOBS, warm=False, limits=NO_LIMITS):
+    challenge_id = expand_challenge_id(challenge_id)
+    logger.info('verify(%s)', challenge_id)
+
+    if not validate_challenge_id(challenge_id):
+        show_challenge_id_error()
+        raise Failure()
+
+    try:
+        challenge = get_challenge(challenge_id)
+        challenge.load_or_download()
+    except Failure:
+        raise
+    except Exception:
+        logger.exception('challenge retrieval failed')
+        write('The challenge retrieval has failed', err=True, fg='red')
+        write('Please check the challenge ID on vimgolf.com', err=True, fg='red')
+        raise Failure()
+
+    # The sessions of the pool poll for jobs with timers (see vimgolf-worker.vim)
+    if warm and not get_editor().has('timers'):
+        write('{} has no +timers, so --warm is ignored'.format(get_editor().name), err=True, fg='yellow')
+        warm = False
+
+    sequences = (
+        (index, line.rstrip('\r\n'))
+        for index, line in enumerate(keys_file)
+        if line.rstrip('\r\n')
+    )
+    with tempfile.TemporaryDirectory() as workspace:
+        outfile = os.path.join(workspace, 'out{}'.format(challenge.out_extension))
+        with open(outfile, 'w') as f:
+            f.write(challenge.out_text)
+        pool = WorkerPool(workspace, jobs, limits) if warm else None
+        try:
+            verify_sequences(challenge, workspace, outfile, sequences, jobs, pool, limits)
+        finally:
+            if pool:
+                pool.close()
+
+
+def verify_sequences(challenge, workspace, outfile, sequences, jobs, pool, limits):
+    # Each result is written as soon as it's done, even while the next sequence
+    # is being read (e.g., from a slow or interactive stdin).
+    write_lock = threading.Lock()
+
+    def write_result(future):
+        with write_lock:
+            write(json.dumps(future.result()))
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=jobs) as executor:
+        # Keep a bounded number of sequences in flight
+        pending = set()
+        for index, keys in sequences:
+            if len(pending) >= 2 * jobs:
+                _, pending = concurrent.futures.wait(
+                    pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            future = executor.submit(
+                verify_single,
+                challenge=challenge,
+                workspace=workspace,
+                outfile=outfile,
+                index=index,
+                keys=keys,
+                pool=pool,
+                limits=limits,
+            )
+            future.add_done_callback(write_result)
+            pending.add(future)
+
+
+def verify_single(challenge, workspace, outfile, index, keys, pool=None, limits=NO_LIMITS):
+    sequence_workspace = os.path.join(workspace, str(index))
+    os.makedirs(sequence_workspace)
+    infile = os.path.join(sequence_workspace, 'in{}'.format(challenge.in_extension))
+    logfile = os.path.join(sequence_workspace, 'log')
+    scriptfile = os.path.join(sequence_workspace, 'script')
+    with open(infile, 'w') as f:
+        f.write(challenge.in_text)
+    result = {'index': index, 'keys': keys}
+    start = time.time()
+    try:
+        if pool:
+            play_result = play_pooled(
+                pool=pool,
+                infile=infile,
+                logfile=logfile,
+                outfile=outfile,
+                workspace=sequence_workspace,
+                keys=keys,
+            )
+        else:
+            with open(scriptfile, 'w') as f:
+                f.write('{}\n'.format(KeycodeReprs(keys).call_feedkeys))
+                # Sequences that don't quit are saved and quit once their keys are processed.
+                # These keys aren't typed (no "t" flag), so they aren't logged and scored.
+                f.write('call timer_start(0, {{-> feedkeys("{}", "")}})\n'.format(REPLAY_QUIT.escaped_joined))
+            play_result = play_single(
+                infile=infile,
+                logfile=logfile,
+                outfile=outfile,
+                scriptfile=scriptfile,
+                headless=True,
+                limits=limits,
+                # Failures are reported in the result
+                quiet=True,
+            )
+        result['correct'] = play_result['correct']
+        result['score'] = play_result['score']
+    except SessionTimeout:
+        logger.info('verify timed out: {}'.format(keys))
+        result['error'] = 'timeout'
+    except Exception:
+        logger.exception('verify failed: {}'.format(keys))
+        result['error'] = 'replay failed'
+    finally:
+        shutil.rmtree(sequence_workspace, ignore_errors=True)
+    result['elapsed'] = round(time.time() - start, 3)
+    return result
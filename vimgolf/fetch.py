@@ -0,0 +1,164 @@
+"""asyncio layer for the commands that fetch several web resources at once.
+
+Requests go through http_request (and so its kept-alive connections and the
+response cache), each in a thread, with at most per_host of them in flight for
+each host. Each request has a deadline, as have all the requests of a run. On
+Ctrl-C, the pending requests are cancelled.
+
+A request can't be interrupted once sent, so a request past its deadline, or
+cancelled, is abandoned: its thread is a daemon, which doesn't keep the
+process from exiting. It still counts as in flight for its host until it's
+over.
+
+run and fetch_all are the sync facade, for use by the commands.
+"""
+
+import asyncio
+import threading
+import urllib.parse
+
+from vimgolf import FETCH_TIMEOUT, MAX_REQUEST_WORKERS
+from vimgolf.utils import http_request
+
+
+class FetchTimeout(Exception):
+    def __init__(self, url):
+        super().__init__('Request deadline exceeded: {}'.format(url))
+        self.url = url
+
+
+class Fetcher:
+    def __init__(self, per_host=MAX_REQUEST_WORKERS, timeout=FETCH_TIMEOUT, deadline=None, interval=0):
+        """
+        timeout is in seconds, for each request (with its retries), and deadline
+        for all the requests (None for no limit). Requests to a host are started
+        at least interval seconds apart.
+        """
+        self.per_host = per_host
+        self.timeout = timeout
+        self.deadline = deadline
+        self.interval = interval
+        self.loop = None
+        self.end_time = None
+        # host -> [semaphore, time at which the next request may start]
+        self.hosts = {}
+
+    async def fetch(self, url, data=None):
+        """GET url, or POST data to it (see http_request), raising FetchTimeout past a deadline."""
+        host = urllib.parse.urlsplit(url).netloc
+        if host not in self.hosts:
+            self.hosts[host] = [asyncio.Semaphore(self.per_host), 0]
+        host_state = self.hosts[host]
+        semaphore = host_state[0]
+        await semaphore.acquire()
+        try:
+            now = self.loop.time()
+            start_time = max(now, host_state[1])
+            host_state[1] = start_time + self.interval
+            if start_time > now:
+                await asyncio.sleep(start_time - now)
+            timeout = self._timeout(url)
+        except BaseException:
+            semaphore.release()
+            raise
+        # The semaphore is released by the request's thread, once it's over
+        future = self._start_request(url, data, semaphore)
+        try:
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            raise FetchTimeout(url)
+
+    def _start_request(self, url, data, semaphore):
+        """Run http_request in a daemon thread, returning a future of its response."""
+        future = self.loop.create_future()
+
+        def request():
+            try:
+                response, error = http_request(url, data), None
+            except BaseException as e:
+                response, error = None, e
+
+            def done():
+                semaphore.release()
+                # The future is cancelled if the request was abandoned
+                if future.done():
+                    return
+                if error is not None:
+                    future.set_exception(error)
+                else:
+                    future.set_result(response)
+
+            try:
+                self.loop.call_soon_threadsafe(done)
+            except RuntimeError:
+                # The loop is closed, since the run is over
+                pass
+
+        threading.Thread(target=request, daemon=True).start()
+        return future
+
+    def _timeout(self, url):
+        if self.end_time is None:
+            return self.timeout
+        remaining = self.end_time - self.loop.time()
+        if remaining <= 0:
+            raise FetchTimeout(url)
+        return min(self.timeout, remaining)
+
+    async def _run(self, main):
+        self.loop = asyncio.get_event_loop()
+        if self.deadline is not None:
+            self.end_time = self.loop.time() + self.deadline
+        return await main(self)
+
+
+async def gather(*coroutines):
+    """
+    Like asyncio.gather, returning the results in order, but the other coroutines
+    are cancelled as soon as one raises an exception (which is then raised).
+    """
+    tasks = [asyncio.ensure_future(coroutine) for coroutine in coroutines]
+    if not tasks:
+        return []
+    try:
+        await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+    finally:
+        pending = [task for task in tasks if not task.done()]
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.wait(pending)
+    for task in tasks:
+        if not task.cancelled() and task.exception() is not None:
+            raise task.exception()
+    return [task.result() for task in tasks]
+
+
+def run(main, **fetcher_kwargs):
+    """
+    Run main(fetcher), a coroutine function, in a new event loop, and return its
+    result. On Ctrl-C, it's cancelled before KeyboardInterrupt is raised.
+    fetcher_kwargs are passed to Fetcher.
+    """
+    fetcher = Fetcher(**fetcher_kwargs)
+    loop = asyncio.new_event_loop()
+    task = loop.create_task(fetcher._run(main))
+    try:
+        return loop.run_until_complete(task)
+    except KeyboardInterrupt:
+        task.cancel()
+        try:
+            loop.run_until_complete(task)
+        except BaseException:
+            pass
+        raise
+    finally:
+        # Abandoned requests aren't waited for (see the module docstring)
+        loop.close()
+
+
+def fetch_all(urls, **fetcher_kwargs):
+    """Fetch urls concurrently, returning their responses in the same order."""
+    async def fetch_urls(fetcher):
+        return await gather(*[fetcher.fetch(url) for url in urls])
+    return run(fetch_urls, **fetcher_kwargs)
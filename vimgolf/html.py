@@ -1,8 +1,15 @@
 from enum import Enum
 import html.parser
+import re
+import sys
+import types
 from typing import Iterable
 
 from vimgolf import Failure
+from vimgolf.trace import span
+
+# Number of characters fed to a SubtreeParser at a time (see extract)
+EXTRACT_CHUNK_SIZE = 16 * 1024
 
 
 class NodeType(Enum):
@@ -10,13 +17,17 @@ class NodeType(Enum):
     TEXT = 2
 
 
+# Nodes have __slots__ (and their type as a class attribute), since pages have
+# thousands of them.
 class Node:
-    def __init__(self, node_type):
+    __slots__ = ('parent',)
+    node_type = None
+
+    def __init__(self):
         self.parent = None
-        self.node_type = node_type
 
 
-_VOID_ELEMENT_TAGS = [
+_VOID_ELEMENT_TAGS = frozenset([
     'area',
     'base',
     'br',
@@ -31,56 +42,132 @@ _VOID_ELEMENT_TAGS = [
     'source',
     'track',
     'wb'
-]
+])
+
+# Elements whose whitespace-only text is layout (indentation between child
+# elements), which parsers drop unless keep_whitespace is set.
+_WHITESPACE_IGNORING_TAGS = frozenset([
+    'html',
+    'head',
+    'body',
+    'div',
+    'ul',
+    'ol',
+    'dl',
+    'table',
+    'thead',
+    'tbody',
+    'tfoot',
+    'tr',
+    'form',
+    'header',
+    'footer',
+    'nav',
+    'section',
+    'article',
+])
+
+# Shared by the elements without attributes or children, rather than empty
+# containers for each.
+_NO_ATTRS = types.MappingProxyType({})
+_NO_CHILDREN = ()
 
 
 class Element(Node):
+    __slots__ = ('tag', 'attrs', 'children', 'class_list', 'document')
+    node_type = NodeType.ELEMENT
+
     def __init__(self, tag, attrs):
-        Node.__init__(self, NodeType.ELEMENT)
-        self.tag = tag
-        self.attrs = attrs
-        self.children = []
+        Node.__init__(self)
+        self.tag = sys.intern(tag)
+        # For repeated attributes, the first value is used
+        self.attrs = dict(reversed(attrs)) if attrs else _NO_ATTRS
+        self.children = _NO_CHILDREN
+        class_ = self.attrs.get('class')
+        self.class_list = tuple(class_.split()) if class_ else None
+        # The Document indexing the element, if any
+        self.document = None
+
+    def append(self, node):
+        if not self.children:
+            self.children = []
+        self.children.append(node)
+        node.parent = self
 
     def get_attr(self, value):
-        for attr in self.attrs:
-            if attr[0] == value:
-                return attr[1]
-        return None
+        return self.attrs.get(value)
 
     def get_id(self):
-        return self.get_attr('id')
+        return self.attrs.get('id')
 
     def get_class_list(self):
-        class_list = None
-        class_ = self.get_attr('class')
-        if class_:
-            class_list = class_.split()
-        return class_list
+        return self.class_list
 
     def has_class(self, value):
-        class_list = self.get_class_list()
-        return class_list and value in class_list
+        return self.class_list is not None and value in self.class_list
 
 
 class TextNode(Node):
+    __slots__ = ('data',)
+    node_type = NodeType.TEXT
+
     def __init__(self, data):
-        Node.__init__(self, NodeType.TEXT)
+        Node.__init__(self)
         self.data = data
 
 
-class HTMLParser(html.parser.HTMLParser):
+def _is_ignorable(parent, data):
+    return parent is not None and parent.tag in _WHITESPACE_IGNORING_TAGS and data.isspace()
+
+
+class Document:
+    """
+    The nodes of a parsed page, with the elements indexed by id, class and tag.
+    Iterating over it generates the nodes in document order.
+    """
+
     def __init__(self):
+        # Nodes without a parent
+        self.roots = []
+        self.ids = {}
+        self.classes = {}
+        self.tags = {}
+
+    def add(self, node):
+        if node.parent is None:
+            self.roots.append(node)
+        if node.node_type != NodeType.ELEMENT:
+            return
+        node.document = self
+        id_ = node.get_id()
+        if id_ is not None:
+            self.ids.setdefault(id_, node)
+        for class_ in node.class_list or ():
+            self.classes.setdefault(class_, []).append(node)
+        self.tags.setdefault(node.tag, []).append(node)
+
+    def __iter__(self):
+        stack = list(reversed(self.roots))
+        while stack:
+            node = stack.pop()
+            yield node
+            if node.node_type == NodeType.ELEMENT:
+                stack.extend(reversed(node.children))
+
+
+class HTMLParser(html.parser.HTMLParser):
+    def __init__(self, keep_whitespace=False):
         html.parser.HTMLParser.__init__(self)
-        self.nodes = []
+        self.nodes = Document()
+        self.keep_whitespace = keep_whitespace
         self._stack = []
         self.in_startend = False
 
     def handle_starttag(self, tag, attrs):
         element = Element(tag, attrs)
         if self._stack:
-            self._stack[-1].children.append(element)
-            element.parent = self._stack[-1]
-        self.nodes.append(element)
+            self._stack[-1].append(element)
+        self.nodes.add(element)
         self._stack.append(element)
         if not self.in_startend and tag in _VOID_ELEMENT_TAGS:
             self.handle_endtag(tag)
@@ -94,23 +181,138 @@ class HTMLParser(html.parser.HTMLParser):
         self.in_startend = False
 
     def handle_data(self, data):
+        parent = self._stack[-1] if self._stack else None
+        if not self.keep_whitespace and _is_ignorable(parent, data):
+            return
         text_node = TextNode(data)
+        if parent is not None:
+            parent.append(text_node)
+        self.nodes.add(text_node)
+
+    def error(self, message):
+        raise Failure()
+
+
+def parse_html(raw_html: str, keep_whitespace=False):
+    """
+    The Document of raw_html, which can be used as an iterable of its nodes.
+    Whitespace-only text in container elements (e.g., div) is dropped, unless
+    keep_whitespace is set.
+    """
+    with span('parse_html', 'html', chars=len(raw_html)):
+        parser = HTMLParser(keep_whitespace)
+        parser.feed(raw_html)
+        return parser.nodes
+
+
+class SubtreeParser(html.parser.HTMLParser):
+    """
+    Event-driven parser that only builds the subtrees rooted at the elements
+    selected by is_root, passing each to handle_subtree once it's complete.
+    The rest of the page is skipped, except for the tags and attrs of the open
+    elements (ancestors), which is_root can check. The nodes of the subtrees
+    are indexed by document. Whitespace is dropped as by parse_html.
+    Subclasses set done once they have what they need, to stop the parse
+    (see extract).
+    """
+
+    def __init__(self, keep_whitespace=False):
+        html.parser.HTMLParser.__init__(self)
+        self.ancestors = []
+        self.document = Document()
+        self.keep_whitespace = keep_whitespace
+        self.done = False
+        self._stack = []
+        # Text of the current element since its last tag, which may come in
+        # several handle_data calls (e.g., across chunks, see extract)
+        self._text = []
+        self.in_startend = False
+
+    def is_root(self, tag, attrs):
+        return False
+
+    def handle_subtree(self, element):
+        pass
+
+    def handle_starttag(self, tag, attrs):
+        if self.done:
+            return
+        self._flush_text()
+        if self._stack or self.is_root(tag, attrs):
+            element = Element(tag, attrs)
+            if self._stack:
+                self._stack[-1].append(element)
+            self.document.add(element)
+            self._stack.append(element)
+        else:
+            self.ancestors.append((tag, attrs))
+        if not self.in_startend and tag in _VOID_ELEMENT_TAGS:
+            self.handle_endtag(tag)
+
+    def handle_endtag(self, tag):
+        if self.done:
+            return
+        self._flush_text()
         if self._stack:
-            self._stack[-1].children.append(text_node)
-            text_node.parent = self._stack[-1]
-        self.nodes.append(text_node)
+            element = self._stack.pop()
+            if not self._stack:
+                self.handle_subtree(element)
+        elif self.ancestors:
+            self.ancestors.pop()
+
+    def handle_startendtag(self, tag, attrs):
+        self.in_startend = True
+        html.parser.HTMLParser.handle_startendtag(self, tag, attrs)
+        self.in_startend = False
+
+    def handle_data(self, data):
+        if not self._stack or self.done:
+            return
+        self._text.append(data)
+
+    def _flush_text(self):
+        if not self._text:
+            return
+        data = ''.join(self._text)
+        self._text = []
+        parent = self._stack[-1]
+        if not self.keep_whitespace and _is_ignorable(parent, data):
+            return
+        text_node = TextNode(data)
+        parent.append(text_node)
+        self.document.add(text_node)
+
+    def close(self):
+        html.parser.HTMLParser.close(self)
+        if not self.done:
+            self._flush_text()
 
     def error(self, message):
         raise Failure()
 
 
-def parse_html(raw_html: str):
-    parser = HTMLParser()
-    parser.feed(raw_html)
-    return parser.nodes
+def extract(parser: SubtreeParser, raw_html: str, chunk_size=EXTRACT_CHUNK_SIZE):
+    """Feed raw_html to parser a chunk at a time, until the parser is done. Returns the parser."""
+    with span('extract', 'html', parser=type(parser).__name__, chars=len(raw_html)):
+        for start in range(0, len(raw_html), chunk_size):
+            parser.feed(raw_html[start:start + chunk_size])
+            if parser.done:
+                break
+        else:
+            parser.close()
+        return parser
+
+
+def has_class(attrs, classname):
+    for name, value in attrs:
+        if name == 'class' and value and classname in value.split():
+            return True
+    return False
 
 
 def get_element_by_id(nodes: Iterable[Node], id_: str):
+    if isinstance(nodes, Document):
+        return nodes.ids.get(id_)
     for node in nodes:
         if node.node_type == NodeType.ELEMENT and node.get_id() == id_:
             return node
@@ -118,6 +320,8 @@ def get_element_by_id(nodes: Iterable[Node], id_: str):
 
 
 def get_elements_by_classname(nodes: Iterable[Node], classname: str):
+    if isinstance(nodes, Document):
+        return list(nodes.classes.get(classname, []))
     output = []
     for node in nodes:
         if node.node_type == NodeType.ELEMENT and node.has_class(classname):
@@ -126,6 +330,8 @@ def get_elements_by_classname(nodes: Iterable[Node], classname: str):
 
 
 def get_elements_by_tagname(nodes: Iterable[Node], tagname: str):
+    if isinstance(nodes, Document):
+        return list(nodes.tags.get(tagname, []))
     output = []
     for node in nodes:
         if node.node_type == NodeType.ELEMENT and node.tag == tagname:
@@ -145,3 +351,111 @@ def get_text(nodes: Iterable[Node]):
         else:
             raise RuntimeError('Unknown node type: {}'.format(node.node_type))
     return ''.join(texts)
+
+
+# Selectors (see select)
+
+_COMPOUND_SELECTOR = re.compile(r'^([\w-]+|\*)?((?:[#.][\w-]+)*)$')
+
+
+def _parse_selector(selector):
+    """List of (combinator, (tag, id, classes)), with '>' (child) or ' ' (descendant) combinators."""
+    steps = []
+    combinator = ' '
+    for token in selector.replace('>', ' > ').split():
+        if token == '>':
+            combinator = '>'
+            continue
+        match = _COMPOUND_SELECTOR.match(token)
+        if not match or not (match.group(1) or match.group(2)):
+            raise ValueError('Invalid selector: {}'.format(selector))
+        tag = match.group(1) if match.group(1) != '*' else None
+        id_ = None
+        classes = []
+        for part in re.findall(r'[#.][\w-]+', match.group(2)):
+            if part[0] == '#':
+                id_ = part[1:]
+            else:
+                classes.append(part[1:])
+        steps.append((combinator, (tag, id_, classes)))
+        combinator = ' '
+    if not steps or combinator == '>':
+        raise ValueError('Invalid selector: {}'.format(selector))
+    return steps
+
+
+def _matches(element, compound):
+    tag, id_, classes = compound
+    return (
+        (tag is None or element.tag == tag)
+        and (id_ is None or element.get_id() == id_)
+        and all(element.has_class(class_) for class_ in classes)
+    )
+
+
+def _matches_ancestors(element, steps, index, root):
+    """Whether the ancestors of element (below root) match steps[:index], given their combinators."""
+    if index == 0:
+        # A leading '>' selects the children of root
+        return steps[0][0] != '>' or element.parent is root
+    combinator = steps[index][0]
+    parent = element.parent
+    while parent is not None and parent is not root:
+        if _matches(parent, steps[index - 1][1]) and _matches_ancestors(parent, steps, index - 1, root):
+            return True
+        if combinator == '>':
+            return False
+        parent = parent.parent
+    return False
+
+
+def _iter_elements(root):
+    stack = list(reversed(root.children))
+    while stack:
+        node = stack.pop()
+        if node.node_type == NodeType.ELEMENT:
+            yield node
+            stack.extend(reversed(node.children))
+
+
+def select(root, selector: str):
+    """
+    The elements under root (a Document, or an Element for its descendants) that
+    match a CSS-like selector, in document order. Selectors are compound selectors
+    (tag, #id, .class, or combinations like div.grid_5) separated by ' ' (descendant)
+    or '>' (child), e.g. '#content > .grid_5 > div h6 a'. For an Element, the
+    selector is relative to it, and can start with '>' for its children.
+
+    For a Document, the candidates come from its id, class or tag indexes, so that
+    only they are checked. For an Element, its descendants are checked, which is
+    cheaper than filtering the Document's candidates for small subtrees.
+    """
+    steps = _parse_selector(selector)
+    tag, id_, classes = steps[-1][1]
+    if not isinstance(root, Document):
+        candidates = _iter_elements(root)
+        element_root = root
+    elif id_ is not None:
+        element = root.ids.get(id_)
+        candidates = [element] if element is not None else []
+        element_root = None
+    elif classes:
+        candidates = root.classes.get(classes[0], [])
+        element_root = None
+    elif tag is not None:
+        candidates = root.tags.get(tag, [])
+        element_root = None
+    else:
+        candidates = (node for node in root if node.node_type == NodeType.ELEMENT)
+        element_root = None
+    output = []
+    for element in candidates:
+        if _matches(element, steps[-1][1]) and _matches_ancestors(element, steps, len(steps) - 1, element_root):
+            output.append(element)
+    return output
+
+
+def select_one(root, selector: str):
+    """The first element matched by select, or None."""
+    elements = select(root, selector)
+    return elements[0] if elements else None
@@ -0,0 +1,208 @@
+"""On-disk cache of web responses (GET requests), under VIMGOLF_HTTP_CACHE_PATH.
+
+A cached response is used as is while it's fresh (ttl seconds). For stale
+seconds after that, it's still used, and revalidated in the background for
+the next time (which the process waits for at exit, for a bounded time). Older responses are revalidated before use: the request has
+If-None-Match/If-Modified-Since headers, so that an unchanged page costs a
+304 response. In offline mode, cached responses are always used, and
+there's no request. The cache is bounded (see evict), which is checked once
+per process, when a response is first saved.
+"""
+
+import atexit
+import hashlib
+import json
+import os
+import threading
+import time
+
+from vimgolf import (
+    logger,
+    HTTP_CACHE_MAX_AGE,
+    HTTP_CACHE_MAX_BYTES,
+    HTTP_CACHE_REVALIDATION_WAIT,
+    HTTP_CACHE_STALE,
+    HTTP_CACHE_TTL,
+    VIMGOLF_HTTP_CACHE_PATH,
+)
+from vimgolf.http_client import get_http_client, HttpResponse
+
+
+class OfflineError(Exception):
+    def __init__(self, url):
+        super().__init__('Not cached for offline use: {}'.format(url))
+        self.url = url
+
+
+class HttpCache:
+    def __init__(self, path, client, ttl=HTTP_CACHE_TTL, stale=HTTP_CACHE_STALE, offline=False):
+        self.path = path
+        self.client = client
+        self.ttl = ttl
+        self.stale = stale
+        self.offline = offline
+        # url -> revalidation thread
+        self.revalidating = {}
+        self.lock = threading.Lock()
+        self.evicted = False
+
+    def request(self, url):
+        entry = self._load(url)
+        if self.offline:
+            if entry is None:
+                raise OfflineError(url)
+            return _to_response(entry)
+        if entry is not None:
+            age = time.time() - entry['fetched']
+            if age <= self.ttl:
+                return _to_response(entry)
+            if age <= self.ttl + self.stale:
+                self._revalidate_in_background(url, entry)
+                return _to_response(entry)
+        return self._fetch(url, entry)
+
+    def _fetch(self, url, entry):
+        headers = {}
+        if entry is not None:
+            if entry.get('etag'):
+                headers['If-None-Match'] = entry['etag']
+            if entry.get('last_modified'):
+                headers['If-Modified-Since'] = entry['last_modified']
+        response = self.client.request(url, headers=headers)
+        if response.code == 304 and entry is not None:
+            logger.info('not modified: {}'.format(url))
+            entry['fetched'] = time.time()
+        elif response.code == 200:
+            response_headers = dict((k.lower(), v) for k, v in response.headers)
+            entry = {
+                'url': url,
+                'code': response.code,
+                'msg': response.msg,
+                'headers': response.headers,
+                'body': response.body,
+                'etag': response_headers.get('etag'),
+                'last_modified': response_headers.get('last-modified'),
+                'fetched': time.time(),
+            }
+        else:
+            return response
+        self._save(url, entry)
+        return _to_response(entry)
+
+    def _revalidate_in_background(self, url, entry):
+        # The thread is a daemon, so that the command doesn't wait for the
+        # revalidation for longer than wait_for_revalidations allows (e.g.,
+        # with the network down). If it's cut short, the response is
+        # revalidated next time.
+        def revalidate():
+            try:
+                self._fetch(url, entry)
+            except Exception:
+                logger.exception('revalidation failed: {}'.format(url))
+            finally:
+                with self.lock:
+                    self.revalidating.pop(url, None)
+
+        with self.lock:
+            if url in self.revalidating:
+                return
+            # Started under the lock, so that wait_for_revalidations only sees started threads
+            self.revalidating[url] = threading.Thread(target=revalidate, daemon=True)
+            self.revalidating[url].start()
+
+    def wait_for_revalidations(self, timeout=HTTP_CACHE_REVALIDATION_WAIT):
+        """Wait for the pending revalidations to finish, for at most timeout seconds."""
+        deadline = time.monotonic() + timeout
+        with self.lock:
+            threads = list(self.revalidating.values())
+        for thread in threads:
+            thread.join(max(0, deadline - time.monotonic()))
+
+    def _entry_path(self, url):
+        return os.path.join(self.path, '{}.json'.format(hashlib.sha256(url.encode('utf-8')).hexdigest()))
+
+    def _load(self, url):
+        path = self._entry_path(url)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path) as f:
+                entry = json.load(f)
+            return entry if entry['url'] == url else None
+        except Exception:
+            logger.exception('http cache load failed: {}'.format(path))
+            return None
+
+    def _save(self, url, entry):
+        path = self._entry_path(url)
+        tmp_path = '{}.{}.{}.tmp'.format(path, os.getpid(), threading.get_ident())
+        try:
+            with open(tmp_path, 'w') as f:
+                json.dump(entry, f)
+            os.replace(tmp_path, path)
+        except OSError:
+            logger.exception('http cache save failed: {}'.format(path))
+        with self.lock:
+            evict, self.evicted = not self.evicted, True
+        if evict:
+            try:
+                self.evict()
+            except OSError:
+                logger.exception('http cache eviction failed')
+
+    def evict(self, max_bytes=HTTP_CACHE_MAX_BYTES, max_age=HTTP_CACHE_MAX_AGE):
+        """Remove responses fetched max_age seconds ago, then the least recently fetched beyond max_bytes."""
+        now = time.time()
+        entries = []
+        for name in os.listdir(self.path):
+            path = os.path.join(self.path, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        total_size = sum(size for _, size, _ in entries)
+        for fetched, size, path in sorted(entries):
+            if now - fetched <= max_age and total_size <= max_bytes:
+                break
+            logger.info('evicting http cache entry: {}'.format(path))
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total_size -= size
+
+
+def _to_response(entry):
+    return HttpResponse(
+        code=entry['code'],
+        msg=entry['msg'],
+        headers=[tuple(header) for header in entry['headers']],
+        body=entry['body'],
+    )
+
+
+_cache = None
+_cache_lock = threading.Lock()
+_offline = False
+
+
+def set_offline(offline):
+    global _offline
+    _offline = offline
+
+
+def is_offline():
+    return _offline
+
+
+def get_http_cache():
+    """The process-wide HttpCache, in offline mode after set_offline(True)."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = HttpCache(VIMGOLF_HTTP_CACHE_PATH, get_http_client())
+            # So that the next command gets the responses revalidated by this one
+            atexit.register(_cache.wait_for_revalidations)
+        _cache.offline = _offline
+        return _cache
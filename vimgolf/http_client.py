@@ -0,0 +1,228 @@
+"""HTTP client with persistent connections, for the requests to vimgolf.com (GOLF_HOST).
+
+Connections are kept open and reused across requests to the same host, and
+responses are requested compressed. Failed requests are retried with backoff.
+Proxies are used as by urllib (e.g., HTTPS_PROXY, HTTP_PROXY and NO_PROXY).
+"""
+
+import base64
+import http.client
+import threading
+import time
+import urllib.parse
+import urllib.request
+import zlib
+from collections import namedtuple
+
+from vimgolf import logger, HTTP_TIMEOUT, HTTP_RETRIES, HTTP_BACKOFF, MAX_REQUEST_WORKERS
+
+USER_AGENT = 'vimgolf'
+
+HttpResponse = namedtuple('HttpResponse', 'code msg headers body')
+
+# Statuses for which a request is retried
+RETRY_STATUSES = frozenset([429, 500, 502, 503, 504])
+REDIRECT_STATUSES = frozenset([301, 302, 303, 307, 308])
+MAX_REDIRECTS = 5
+
+
+class HttpError(Exception):
+    def __init__(self, url, response):
+        super().__init__('HTTP {} {}: {}'.format(response.code, response.msg, url))
+        self.url = url
+        self.response = response
+
+
+class HttpClient:
+    def __init__(
+            self,
+            timeout=HTTP_TIMEOUT,
+            retries=HTTP_RETRIES,
+            backoff=HTTP_BACKOFF,
+            max_idle_connections=MAX_REQUEST_WORKERS):
+        """
+        timeout is in seconds, for each connection attempt and read. A request is
+        retried up to retries times, waiting backoff seconds, doubled each time.
+        """
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_idle_connections = max_idle_connections
+        # (scheme, host, port) -> idle connections
+        self.idle = {}
+        # (scheme, host, port) -> proxy URL (split), or None, see _get_proxy
+        self.proxies = {}
+        self.lock = threading.Lock()
+
+    def request(self, url, data=None, headers=None):
+        """
+        GET url, or POST data (bytes) to it, following redirects. Returns an
+        HttpResponse with the decoded body, or raises HttpError for a status >= 400.
+        """
+        for _ in range(MAX_REDIRECTS + 1):
+            response = self._request_with_retries(url, data, headers)
+            location = dict((k.lower(), v) for k, v in response.headers).get('location')
+            if response.code not in REDIRECT_STATUSES or not location:
+                break
+            url = urllib.parse.urljoin(url, location)
+            if response.code in (301, 302, 303):
+                data = None
+        if response.code >= 400:
+            raise HttpError(url, response)
+        return response
+
+    def close(self):
+        with self.lock:
+            idle, self.idle = self.idle, {}
+        for connections in idle.values():
+            for connection in connections:
+                connection.close()
+
+    def _request_with_retries(self, url, data, headers):
+        # POST requests may not be idempotent (e.g., uploads), so they're only
+        # retried when sent on a kept-alive connection that the server had closed.
+        retries = self.retries if data is None else 0
+        delay = self.backoff
+        attempt = 0
+        while True:
+            try:
+                response = self._request_once(url, data, headers)
+                if response.code not in RETRY_STATUSES or attempt >= retries:
+                    return response
+                logger.info('retrying request ({}): {}'.format(response.code, url))
+            except _StaleConnection:
+                logger.info('retrying request on a new connection: {}'.format(url))
+                continue
+            except (OSError, http.client.HTTPException):
+                if attempt >= retries:
+                    raise
+                logger.exception('retrying request: {}'.format(url))
+            attempt += 1
+            time.sleep(delay)
+            delay *= 2
+
+    def _request_once(self, url, data, headers):
+        parts = urllib.parse.urlsplit(url)
+        key = (parts.scheme, parts.hostname, parts.port)
+        path = parts.path or '/'
+        if parts.query:
+            path += '?' + parts.query
+        request_headers = {
+            'User-Agent': USER_AGENT,
+            'Accept-Encoding': 'gzip, deflate',
+        }
+        if data is not None:
+            request_headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        request_headers.update(headers or {})
+        proxy = self._get_proxy(key)
+        if proxy is not None and parts.scheme == 'http':
+            # Plain HTTP requests are sent to the proxy, with the full URL
+            path = urllib.parse.urlunsplit((parts.scheme, parts.netloc, path, '', ''))
+            request_headers.update(_proxy_headers(proxy))
+        connection, reused = self._get_connection(key)
+        try:
+            connection.request('GET' if data is None else 'POST', path, body=data, headers=request_headers)
+            response = connection.getresponse()
+            raw_body = response.read()
+        except (OSError, http.client.HTTPException) as e:
+            connection.close()
+            if reused and isinstance(e, (ConnectionError, http.client.RemoteDisconnected)):
+                raise _StaleConnection()
+            raise
+        if response.will_close:
+            connection.close()
+        else:
+            self._put_connection(key, connection)
+        return HttpResponse(
+            code=response.status,
+            msg=response.reason,
+            headers=response.getheaders(),
+            body=decode_body(response, raw_body),
+        )
+
+    def _get_connection(self, key):
+        with self.lock:
+            connections = self.idle.get(key)
+            if connections:
+                return connections.pop(), True
+        scheme, host, port = key
+        proxy = self._get_proxy(key)
+        if proxy is not None and scheme == 'https':
+            # HTTPS requests go through a tunnel (CONNECT), with TLS to the host
+            connection = http.client.HTTPSConnection(proxy.hostname, proxy.port, timeout=self.timeout)
+            connection.set_tunnel(host, port, headers=_proxy_headers(proxy))
+        elif proxy is not None:
+            connection = http.client.HTTPConnection(proxy.hostname, proxy.port, timeout=self.timeout)
+        elif scheme == 'https':
+            connection = http.client.HTTPSConnection(host, port, timeout=self.timeout)
+        else:
+            connection = http.client.HTTPConnection(host, port, timeout=self.timeout)
+        return connection, False
+
+    def _get_proxy(self, key):
+        """The proxy for requests to key's host, as chosen by urllib, or None."""
+        with self.lock:
+            if key in self.proxies:
+                return self.proxies[key]
+        scheme, host, port = key
+        proxy = urllib.request.getproxies().get(scheme)
+        netloc = host if port is None else '{}:{}'.format(host, port)
+        if proxy and not urllib.request.proxy_bypass(netloc):
+            if '://' not in proxy:
+                proxy = 'http://{}'.format(proxy)
+            proxy = urllib.parse.urlsplit(proxy)
+        else:
+            proxy = None
+        with self.lock:
+            self.proxies[key] = proxy
+        return proxy
+
+    def _put_connection(self, key, connection):
+        with self.lock:
+            connections = self.idle.setdefault(key, [])
+            if len(connections) < self.max_idle_connections:
+                connections.append(connection)
+                return
+        connection.close()
+
+
+class _StaleConnection(Exception):
+    pass
+
+
+def _proxy_headers(proxy):
+    if proxy.username is None:
+        return {}
+    credentials = '{}:{}'.format(
+        urllib.parse.unquote(proxy.username), urllib.parse.unquote(proxy.password or ''))
+    return {'Proxy-Authorization': 'Basic {}'.format(base64.b64encode(credentials.encode('utf-8')).decode('ascii'))}
+
+
+def decode_body(response, raw_body):
+    encoding = (response.getheader('Content-Encoding') or '').strip().lower()
+    if encoding == 'gzip':
+        raw_body = zlib.decompress(raw_body, 16 + zlib.MAX_WBITS)
+    elif encoding == 'deflate':
+        # Some servers send raw deflate data, rather than the zlib format
+        try:
+            raw_body = zlib.decompress(raw_body)
+        except zlib.error:
+            raw_body = zlib.decompress(raw_body, -zlib.MAX_WBITS)
+    try:
+        charset = response.getheader('Content-Type').split(';')[1].split('=')[1].strip()
+    except Exception:
+        charset = 'utf-8'
+    return raw_body.decode(charset)
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_http_client():
+    """The process-wide HttpClient, so that connections are shared by all requests."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = HttpClient()
+        return _client
@@ -1,5 +1,11 @@
 """Maps keys recorded by vim to a printable representation"""
 
+import sys
+from array import array
+
+# Index of the low byte within each two-byte keycode in native byte order
+_LOW_BYTE = 0 if sys.byteorder == 'little' else 1
+
 
 def to_bytes(kc):
     """Convert an integer to bytes."""
@@ -13,24 +19,33 @@ def to_int(kc):
 
 # Vim records key presses using 1) a single byte or 2) a 0x80 byte
 # followed by two bytes. Parse the single-bytes and double-bytes.
-# For the returned list, all values are represented with two bytes
-# (single bytes are padded).
-def parse_keycodes(raw_keys):
+# For the returned array, all values are represented as two-byte
+# integers (single bytes are zero-padded).
+def parse_keycodes(raw_keys, ignored=frozenset()):
     """
-    Parse list of keypress bytes from raw keypress representation saved
-    by vim's -w.
+    Parse array of keypress codes from raw keypress representation saved
+    by vim's -w. raw_keys can be any bytes-like object (e.g., bytes or mmap).
+    Double-byte keycodes in ignored are skipped.
     """
-    keycodes = []
-    tmp = list(reversed(raw_keys))
-    while tmp:
-        b0 = tmp.pop()
-        if b0 == 0x80:
-            b1 = tmp.pop()
-            b2 = tmp.pop()
-            keycode = bytes((b1, b2))
-        else:
-            keycode = to_bytes(b0)
-        keycodes.append(keycode)
+    keycodes = array('H')
+    view = memoryview(raw_keys).cast('B')
+    find = getattr(raw_keys, 'find', None) or bytes(view).find
+    pos = 0
+    end = len(view)
+    while pos < end:
+        # Single bytes up to the next 0x80 are added in bulk
+        escape = find(b'\x80', pos)
+        if escape == -1:
+            escape = end
+        single_bytes = bytearray(2 * (escape - pos))
+        single_bytes[_LOW_BYTE::2] = view[pos:escape]
+        keycodes.frombytes(single_bytes)
+        if escape + 2 >= end:
+            break
+        keycode = view[escape + 1] << 8 | view[escape + 2]
+        if keycode not in ignored:
+            keycodes.append(keycode)
+        pos = escape + 3
     return keycodes
 
 
@@ -64,8 +79,9 @@ def tokenize_raw_keycode_reprs(
 
 
 def escape_tokens(tokens):
+    """Tokens escaped for a vim double-quoted string (e.g., for feedkeys)."""
     return [
-        '\\{}'.format(t) if len(t) > 1 else t
+        '\\{}'.format(t) if len(t) > 1 else t.replace('\\', '\\\\').replace('"', '\\"')
         for t in tokens
     ]
 
@@ -245,43 +261,106 @@ _KEYCODE_REPR_LOOKUP.update({
 })
 
 
+# Lookup table from all two-byte keycodes to their representation.
+# Unknown keycodes are filled in when they are first looked up.
+_KEYCODE_REPRS = [None] * 0x10000
+for keycode, keycode_repr in _KEYCODE_REPR_LOOKUP.items():
+    _KEYCODE_REPRS[to_int(keycode)] = keycode_repr
+
+_IGNORED_KEYCODES = frozenset(to_int(keycode) for keycode in IGNORED_KEYSTROKES)
+
+
 def get_keycode_repr(keycode):
-    if keycode in _KEYCODE_REPR_LOOKUP:
-        key = _KEYCODE_REPR_LOOKUP[keycode]
-    else:
+    """Representation of an integer keycode (see parse_keycodes)."""
+    key = _KEYCODE_REPRS[keycode]
+    if key is None:
         # Show unknown keycodes as hex codes surrounded by brackets.
-        key = ''.join('\\x{:02x}'.format(kc) for kc in keycode)
+        key = ''.join('\\x{:02x}'.format(kc) for kc in to_bytes(keycode))
         key = '[' + key + ']'
+        _KEYCODE_REPRS[keycode] = key
     return key
 
 
 class KeycodeReprs:
-    def __init__(self, raw_keycode_reprs, literal_lt=None, literal_gt=None):
-        self.raw_keycode_reprs = raw_keycode_reprs
+    """
+    Tokenized key sequence, e.g. `Ji1<Esc>ZZ`.
+
+    Prefixes and concatenations are views over a shared, append-only list of
+    tokens, so they don't tokenize or copy the tokens they have in common.
+    The derived representations are computed on first access.
+    """
+    def __init__(self, raw_keycode_reprs='', literal_lt=None, literal_gt=None):
         self.literal_lt = literal_lt or ''
         self.literal_gt = literal_gt or ''
-        self.tokens = tokenize_raw_keycode_reprs(
+        self._tokens = tokenize_raw_keycode_reprs(
             raw_keycode_reprs=raw_keycode_reprs,
             literal_lt=literal_lt,
             literal_gt=literal_gt,
         )
-        self.joined = ''.join(self.tokens)
-        self.escaped = escape_tokens(self.tokens)
-        self.escaped_joined = ''.join(self.escaped)
-        self.call_feedkeys = 'call feedkeys("{}", "t")'.format(self.escaped_joined)
+        self._length = len(self._tokens)
+        self._reset()
+
+    def _reset(self):
+        self._joined = None
+        self._escaped = None
+        self._escaped_joined = None
+        self._call_feedkeys = None
+
+    def _view(self, tokens, length):
+        result = KeycodeReprs.__new__(KeycodeReprs)
+        result.literal_lt = self.literal_lt
+        result.literal_gt = self.literal_gt
+        result._tokens = tokens
+        result._length = length
+        result._reset()
+        return result
+
+    def __len__(self):
+        return self._length
+
+    def prefix(self, length):
+        """The first `length` tokens."""
+        assert 0 <= length <= self._length
+        return self._view(self._tokens, length)
+
+    @property
+    def tokens(self):
+        # A copy, since the list is shared with other prefixes and concatenations
+        return self._tokens[:self._length]
+
+    @property
+    def joined(self):
+        if self._joined is None:
+            self._joined = ''.join(self.tokens)
+        return self._joined
+
+    @property
+    def escaped(self):
+        if self._escaped is None:
+            self._escaped = escape_tokens(self.tokens)
+        return self._escaped
+
+    @property
+    def escaped_joined(self):
+        if self._escaped_joined is None:
+            self._escaped_joined = ''.join(self.escaped)
+        return self._escaped_joined
+
+    @property
+    def call_feedkeys(self):
+        if self._call_feedkeys is None:
+            self._call_feedkeys = 'call feedkeys("{}", "t")'.format(self.escaped_joined)
+        return self._call_feedkeys
 
     def __add__(self, other):
+        # Literal `<` and `>` were already replaced when `other` was tokenized.
         assert isinstance(other, KeycodeReprs)
-        other_raw = (
-            other.raw_keycode_reprs
-                 .replace(other.literal_lt, self.literal_lt)
-                 .replace(other.literal_gt, self.literal_gt)
-        )
-        return KeycodeReprs(
-            raw_keycode_reprs=self.raw_keycode_reprs + other_raw,
-            literal_lt=self.literal_lt,
-            literal_gt=self.literal_gt
-        )
+        tokens = self._tokens
+        if self._length < len(tokens):
+            # The shared tokens were extended past this view by another concatenation.
+            tokens = tokens[:self._length]
+        tokens.extend(other._tokens[:other._length])
+        return self._view(tokens, len(tokens))
 
 
 # A naive approach for a key sequence that will save buffer content and quit
@@ -292,25 +371,27 @@ REPLAY_QUIT = KeycodeReprs('<Esc><Esc><Esc>:<C-U>wqall<CR>')
 
 
 class Keys:
-    def __init__(self, raw_keys, keycodes, keycode_reprs):
+    def __init__(self, raw_keys, keycodes):
         # raw keypress representation saved by vim's -w
         self.raw_keys = raw_keys
-        # list of parsed keycode byte strings
+        # array of parsed keycodes
         self.keycodes = keycodes
-        # list of human-readable key strings
-        self.keycode_reprs = keycode_reprs
+        self._keycode_reprs = None
 
     @property
     def score(self):
         return len(self.keycodes)
 
+    @property
+    def keycode_reprs(self):
+        """List of human-readable key strings."""
+        if self._keycode_reprs is None:
+            self._keycode_reprs = [get_keycode_repr(keycode) for keycode in self.keycodes]
+        return self._keycode_reprs
+
     @classmethod
     def from_raw_keys(cls, raw_keys):
-        keycodes = parse_keycodes(raw_keys)
-        keycodes = [keycode for keycode in keycodes if keycode not in IGNORED_KEYSTROKES]
-        keycode_reprs = [get_keycode_repr(keycode) for keycode in keycodes]
         return Keys(
             raw_keys=raw_keys,
-            keycodes=keycodes,
-            keycode_reprs=keycode_reprs,
+            keycodes=parse_keycodes(raw_keys, ignored=_IGNORED_KEYCODES),
         )
@@ -0,0 +1,114 @@
+"""The log, shared by all vimgolf processes and rotated by size.
+
+Records are put on a queue by the logger, and written by a background thread
+(QueueListener), so that logging doesn't wait for the disk. Processes append
+to the same file. A rotation is done by one process at a time, under a lock
+file, and the others then reopen the new log.
+"""
+
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+
+try:
+    import fcntl
+except ImportError:
+    # Not available on Windows, where rotations aren't serialized
+    fcntl = None
+
+from vimgolf import LOG_BACKUP_COUNT, LOG_LEVEL, LOG_MAX_BYTES, VIMGOLF_LOG_LEVEL_PATH
+
+LOG_FORMAT = '%(asctime)s - %(process)d - %(levelname)s - %(message)s'
+
+
+class SharedRotatingFileHandler(logging.handlers.RotatingFileHandler):
+    """
+    RotatingFileHandler for a log that other processes append to, and rotate, as well.
+
+    A rotation by another process is only looked for once the log (as this
+    handler has it open) is about to reach max_bytes. Until then, records are
+    appended to the log that was rotated, which isn't much larger than that.
+    """
+
+    def __init__(self, path, max_bytes, backup_count):
+        logging.handlers.RotatingFileHandler.__init__(
+            self, path, mode='a', maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8')
+        self.lock_file = None
+        if fcntl is not None:
+            self.lock_file = open('{}.lock'.format(path), 'a')
+
+    def emit(self, record):
+        if self.lock_file is None:
+            logging.handlers.RotatingFileHandler.emit(self, record)
+            return
+        fcntl.flock(self.lock_file, fcntl.LOCK_EX)
+        try:
+            logging.handlers.RotatingFileHandler.emit(self, record)
+        finally:
+            fcntl.flock(self.lock_file, fcntl.LOCK_UN)
+
+    def shouldRollover(self, record):
+        if self.stream is None:
+            self.stream = self._open()
+        size = len('{}\n'.format(self.format(record)))
+        self.stream.seek(0, 2)
+        if self.stream.tell() + size < self.maxBytes:
+            return False
+        # Another process may have rotated the log already
+        self._reopen_if_rotated()
+        self.stream.seek(0, 2)
+        # Never rotate anything other than a regular file (e.g., /dev/null)
+        return self.stream.tell() + size >= self.maxBytes and os.path.isfile(self.baseFilename)
+
+    def close(self):
+        logging.handlers.RotatingFileHandler.close(self)
+        if self.lock_file is not None:
+            self.lock_file.close()
+            self.lock_file = None
+
+    def _reopen_if_rotated(self):
+        """Reopen the log if another process has rotated it (renamed it, and started a new one)."""
+        try:
+            rotated = os.stat(self.baseFilename).st_ino != os.fstat(self.stream.fileno()).st_ino
+        except FileNotFoundError:
+            rotated = True
+        if rotated:
+            self.stream.close()
+            self.stream = self._open()
+
+
+def get_log_level():
+    """The level set by GOLF_LOG_LEVEL, or else by the log_level config file, or else LOG_LEVEL."""
+    level = os.environ.get('GOLF_LOG_LEVEL')
+    if not level and os.path.exists(VIMGOLF_LOG_LEVEL_PATH):
+        with open(VIMGOLF_LOG_LEVEL_PATH) as f:
+            level = f.read().strip()
+    level = (level or LOG_LEVEL).upper()
+    if not isinstance(logging.getLevelName(level), int):
+        level = LOG_LEVEL
+    return level
+
+
+def start_logging(logger, path, level=None):
+    """
+    Send the records of logger to the log at path, through a queue. The records
+    are written by a background thread, which is stopped (after writing the
+    remaining records) at exit. Returns the QueueListener.
+    """
+    level = level or get_log_level()
+    handler = SharedRotatingFileHandler(path, LOG_MAX_BYTES, LOG_BACKUP_COUNT)
+    handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    records = queue.Queue()
+    listener = logging.handlers.QueueListener(records, handler)
+    logger.setLevel(level)
+    logger.addHandler(logging.handlers.QueueHandler(records))
+    listener.start()
+
+    def stop():
+        listener.stop()
+        handler.close()
+
+    atexit.register(stop)
+    return listener
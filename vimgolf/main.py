@@ -1,26 +1,48 @@
 import functools
 import sys
 
-from click import argument, option, group
+from click import argument, option, group, pass_context, File, FloatRange, IntRange, Path
 
 from vimgolf import (
     __version__,
+    ANSWER_LIMIT,
+    MAX_REQUEST_WORKERS,
+    REPLAY_JOBS,
+    REPLAY_TIMEOUT,
+    REPLAY_CPU_LIMIT,
+    REPLAY_MEMORY_LIMIT,
+    SYNC_REQUEST_INTERVAL,
     commands,
     Failure,
     logger,
     init_logger,
-    clean_stale_logs,
     setup_directories,
 )
-from vimgolf.commands.ls import parse_list_spec
 from vimgolf.utils import write
 
+# Commands that run without the directories and the log
+TRIVIAL_COMMANDS = frozenset(['version'])
 
+
+# The modules of the commands (and their dependencies) are imported when the
+# command runs (see vimgolf.commands), so that the CLI starts quickly.
 @group()
-def main():
+@option('--offline', is_flag=True, help='Use cached web pages only, without network requests')
+@option('--trace', 'trace_path', type=Path(dir_okay=False), metavar='FILE',
+        help='Write a trace of where the time goes (Chrome trace format, see https://ui.perfetto.dev)')
+@pass_context
+def main(ctx, offline, trace_path):
+    if trace_path:
+        from vimgolf.trace import start_tracing, stop_tracing
+        start_tracing(trace_path, 'vimgolf {}'.format(ctx.invoked_subcommand))
+        ctx.call_on_close(stop_tracing)
+    if offline:
+        from vimgolf.http_cache import set_offline
+        set_offline(True)
+    if ctx.invoked_subcommand in TRIVIAL_COMMANDS:
+        return
     setup_directories()
     init_logger()
-    clean_stale_logs()
     logger.info('vimgolf started')
 
 
@@ -36,6 +58,31 @@ def command(*cmd_args, **cmd_kwargs):
     return result
 
 
+def limit_options(fn):
+    """Options for the limits of each replay session (see get_limits)."""
+    fn = option('--memory-limit', type=IntRange(min=0), default=REPLAY_MEMORY_LIMIT, show_default=True,
+                help='Max MiB of memory for each replay session (0 for no limit)')(fn)
+    fn = option('--cpu-limit', type=FloatRange(min=0), default=REPLAY_CPU_LIMIT, show_default=True,
+                help='Max seconds of CPU time for each replay session (0 for no limit)')(fn)
+    fn = option('--timeout', type=FloatRange(min=0), default=REPLAY_TIMEOUT, show_default=True,
+                help='Max seconds for each replay session (0 for no limit)')(fn)
+    return fn
+
+
+def list_spec(ctx, param, value):
+    from vimgolf.commands.ls import parse_list_spec
+    return parse_list_spec(value)
+
+
+def get_limits(timeout, cpu_limit, memory_limit):
+    from vimgolf.vim import SessionLimits
+    return SessionLimits(
+        timeout=timeout or None,
+        cpu=cpu_limit or None,
+        memory=memory_limit * 1024 * 1024 or None,
+    )
+
+
 @command()
 @argument('in_file')
 @argument('out_file')
@@ -60,18 +107,24 @@ def diff(challenge_id):
 
 
 @command()
-@argument('spec', default='', callback=lambda _, __, value: parse_list_spec(value))
+@argument('spec', default='', callback=list_spec)
 @option('-i', '--incomplete', is_flag=True, help='Show incomplete (not submitted) items only')
-def ls(spec, incomplete):
+@option('--prefetch/--no-prefetch', default=True, show_default=True,
+        help='Download the listed challenges after showing them, to play them without waiting')
+def ls(spec, incomplete, prefetch):
     """list vimgolf.com challenges (spec syntax: [PAGE][:LIMIT])"""
-    commands.ls(incomplete=incomplete, **spec)
+    commands.ls(incomplete=incomplete, prefetch=prefetch, **spec)
 
 
 @command()
 @argument('challenge_id')
-def show(challenge_id):
+@option('-a', '--answers', type=IntRange(min=0), default=ANSWER_LIMIT, show_default=True,
+        help='Number of entered solutions to show (0 for all)')
+@option('-p', '--page', type=IntRange(min=1), default=1, show_default=True,
+        help='Page of entered solutions, from the most recent')
+def show(challenge_id, answers, page):
     """show vimgolf.com challenge"""
-    commands.show(challenge_id)
+    commands.show(challenge_id, answers, page)
 
 
 @command()
@@ -86,14 +139,66 @@ def config(api_key):
 @argument('keys')
 @option('-l', '--literal-lt', help='If `keys` contains a literal `<`, replace it with `literal-lt`')
 @option('-g', '--literal-gt', help='If `keys` contains a literal `>`, replace it with `literal-gt`')
-def inspect(challenge_id, keys, literal_lt, literal_gt):
+@limit_options
+def inspect(challenge_id, keys, literal_lt, literal_gt, timeout, cpu_limit, memory_limit):
     """inspect behaviour of a key sequence applied to challenge.
 
        The second argument (keys) should be literal key sequence: e.g. `Ji1<Esc>ZZ`.
 
        Use <C-J> and <C-K> inside the inspect window to move between steps
     """
-    commands.inspect(challenge_id, keys, literal_lt, literal_gt)
+    limits = get_limits(timeout, cpu_limit, memory_limit)
+    commands.inspect(challenge_id, keys, literal_lt, literal_gt, limits)
+
+
+@command()
+@argument('challenge_id')
+@option('-f', '--keys-file', type=File('r'), default='-', show_default=True,
+        help='File with a key sequence per line (`-` for stdin)')
+@option('-j', '--jobs', type=IntRange(min=1), default=REPLAY_JOBS, show_default=True,
+        help='Number of parallel replays')
+@option('--warm', is_flag=True,
+        help='Reuse vim sessions across sequences (faster, see below)')
+@limit_options
+def verify(challenge_id, keys_file, jobs, warm, timeout, cpu_limit, memory_limit):
+    """verify key sequences against challenge, without a UI.
+
+       Each line of the keys file is a literal key sequence: e.g. `Ji1<Esc>ZZ`.
+       A JSON line is written for each sequence as it finishes, with the
+       fields: index, keys, correct, score, elapsed (or error). Sequences
+       that go over the time limits are killed, with "timeout" as the error.
+
+       Sequences that don't quit are saved and quit after their last key.
+       The added keys are not scored.
+
+       With --warm, each of the parallel vim sessions runs many sequences.
+       The session is reset between sequences, except for some state (e.g.,
+       what `.` repeats), so a sequence that relies on it may be misjudged.
+    """
+    limits = get_limits(timeout, cpu_limit, memory_limit)
+    commands.verify(challenge_id, keys_file, jobs, warm, limits)
+
+
+@command()
+def reindex():
+    """rebuild the answer stats of stored challenges"""
+    commands.reindex()
+
+
+@command()
+@option('-j', '--jobs', type=IntRange(min=1), default=MAX_REQUEST_WORKERS, show_default=True,
+        help='Number of parallel downloads')
+@option('-i', '--interval', type=FloatRange(min=0), default=SYNC_REQUEST_INTERVAL, show_default=True,
+        help='Min seconds between web requests')
+@option('--restart', is_flag=True, help='Start from the first page, rather than resume an interrupted sync')
+def sync(jobs, interval, restart):
+    """download all vimgolf.com challenges, for offline use.
+
+       Challenges that are already stored, with the same number of entries
+       as on the last sync, are skipped. An interrupted sync resumes from
+       the page where it stopped.
+    """
+    commands.sync(jobs, interval, restart)
 
 
 @command()
@@ -6,8 +6,9 @@ import urllib.parse
 from vimgolf import logger, GOLF_HOST
 from vimgolf.challenge import get_challenge_url
 from vimgolf.keys import Keys, KeycodeReprs
+from vimgolf.replay import replay_range, get_replay_in_path
 from vimgolf.utils import write, input_loop, http_request
-from vimgolf.vim import vim, BASE_ARGS
+from vimgolf.vim import vim, BASE_ARGS, NO_LIMITS
 
 
 def play(challenge, workspace, keys=None, diff=False):
@@ -100,12 +101,12 @@ def main_loop(challenge, infile, logfile, outfile, scriptfile, initial_keys, dif
             break
 
 
-def play_single(infile, logfile, outfile, scriptfile):
+def play_single(infile, logfile, outfile, scriptfile, headless=False, limits=NO_LIMITS, quiet=False):
     vim(BASE_ARGS + [
         '-W', logfile,  # keylog file (overwrites existing)
         '-S', scriptfile,
         infile,
-    ], check=True)
+    ], headless=headless, limits=limits, quiet=quiet, check=True)
     correct = filecmp.cmp(infile, outfile)
     with open(logfile, 'rb') as _f:
         keys = Keys.from_raw_keys(_f.read())
@@ -117,6 +118,38 @@ def play_single(infile, logfile, outfile, scriptfile):
     }
 
 
+def play_pooled(pool, infile, logfile, outfile, workspace, keys):
+    """
+    Like play_single with keys fed by a script, but run by a worker from pool.
+    The keys are replayed (see replay.py) to log them, since the keylog of a
+    worker can't be changed once started. If they don't quit vim, the buffers
+    are saved once they're done.
+    """
+    tokens = KeycodeReprs(keys).tokens
+    store = os.path.join(workspace, 'snapshots')
+    os.makedirs(store, exist_ok=True)
+    replay_range(
+        src_in_path=infile,
+        tokens=tokens,
+        workspace=workspace,
+        store=store,
+        start=len(tokens),
+        stop=len(tokens) + 1,
+        pool=pool,
+        keylog_path=logfile,
+        finish='silent! wall',
+    )
+    correct = filecmp.cmp(get_replay_in_path(infile, workspace), outfile)
+    with open(logfile, 'rb') as _f:
+        keys = Keys.from_raw_keys(_f.read())
+    return {
+        'correct': correct,
+        'keycode_reprs': keys.keycode_reprs,
+        'raw_keys': keys.raw_keys,
+        'score': keys.score,
+    }
+
+
 def menu_loop(
         challenge,
         correct,
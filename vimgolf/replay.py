@@ -0,0 +1,104 @@
+import os
+import shutil
+from collections import namedtuple
+
+from vimgolf import REPLAY_VIM_PATH
+from vimgolf.keys import escape_tokens
+from vimgolf.vim import vim, BASE_ARGS, NO_LIMITS
+
+# digest identifies the buffer content, which is stored at snapshot_path(store, digest)
+ReplayStep = namedtuple('ReplayStep', 'digest changedtick')
+
+
+def replay(src_in_path, tokens, workspace, store, start=0, pool=None, limits=NO_LIMITS):
+    """
+    Replay tokens against a copy of src_in_path using a headless vim session.
+    Returns a ReplayStep for the buffer after the first i tokens, for
+    start <= i <= len(tokens). Each distinct buffer is written once to store.
+
+    The session is taken from pool (a WorkerPool) if given, rather than started.
+    Otherwise, it's killed if it goes over limits, raising SessionTimeout.
+    """
+    n_steps = len(tokens) + 1 - start
+    if n_steps <= 0:
+        return []
+    os.makedirs(store, exist_ok=True)
+    return replay_range(
+        src_in_path=src_in_path,
+        tokens=tokens,
+        workspace=workspace,
+        store=store,
+        start=start,
+        stop=start + n_steps,
+        pool=pool,
+        limits=limits,
+    )
+
+
+def replay_range(
+        src_in_path,
+        tokens,
+        workspace,
+        store,
+        start,
+        stop,
+        pool=None,
+        keylog_path=None,
+        finish=None,
+        limits=NO_LIMITS):
+    """
+    Replay tokens in a single headless vim, returning the ReplaySteps in [start, stop).
+    The fed keys are written to keylog_path if given. A session from pool
+    isn't quit once done, and the finish command is run instead (see vimgolf-replay.vim).
+    """
+    replay_in_path = get_replay_in_path(src_in_path, workspace)
+    replay_script_path = os.path.join(workspace, 'replay.vim')
+    steps_path = os.path.join(workspace, 'replay-steps')
+    shutil.copy(src_in_path, replay_in_path)
+    with open(replay_script_path, 'w') as f:
+        f.write("execute 'source' fnameescape({})\n".format(to_vim_literal(REPLAY_VIM_PATH)))
+        # Pooled sessions may have set these for a previous job
+        f.write('unlet! g:replayKeylogPath g:replayFinish\n')
+        f.write('let g:replayKeys = [{}]\n'.format(','.join(to_vim_key(t) for t in tokens[:stop - 1])))
+        f.write('let g:replayStart = {}\n'.format(start))
+        f.write('let g:replayCount = {}\n'.format(stop - start))
+        f.write('let g:replayStore = {}\n'.format(to_vim_literal(store)))
+        f.write('let g:replayStepsPath = {}\n'.format(to_vim_literal(steps_path)))
+        if keylog_path:
+            f.write('let g:replayKeylogPath = {}\n'.format(to_vim_literal(keylog_path)))
+        if finish:
+            f.write('let g:replayFinish = {}\n'.format(to_vim_literal(finish)))
+        f.write('call ReplayStart()\n')
+    if pool:
+        pool.run(replay_in_path, replay_script_path)
+    else:
+        vim(BASE_ARGS + [
+            '-S', replay_script_path,
+            replay_in_path,
+        ], headless=True, limits=limits, check=True)
+    steps = []
+    with open(steps_path) as f:
+        for line in f:
+            digest, changedtick = line.split()
+            steps.append(ReplayStep(digest=digest, changedtick=int(changedtick)))
+    return steps
+
+
+def get_replay_in_path(src_in_path, workspace):
+    """Path of the copy of src_in_path that a replay edits."""
+    _, ext = os.path.splitext(src_in_path)
+    return os.path.join(workspace, 'replay{}'.format(ext))
+
+
+def snapshot_path(store, digest):
+    return os.path.join(store, digest)
+
+
+def to_vim_key(token):
+    """Vim double-quoted string for a single token (e.g. `x` or `<Esc>`)."""
+    return '"{}"'.format(escape_tokens([token])[0])
+
+
+def to_vim_literal(string):
+    """Vim single-quoted (literal) string."""
+    return "'{}'".format(string.replace("'", "''"))
@@ -0,0 +1,127 @@
+"""Persistent cache of replayed steps, shared across runs of 'vimgolf inspect'.
+
+Each cache entry is a directory for a combination of challenge, vimrc and vim
+build. It holds a trie of the replayed key sequences, where the node reached
+by following a sequence's tokens from the root holds the ReplayStep for that
+sequence, and the snapshot store that the steps refer to.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import time
+
+from vimgolf import (
+    logger,
+    PLAY_VIMRC_PATH,
+    REPLAY_CACHE_MAX_AGE,
+    REPLAY_CACHE_MAX_BYTES,
+    VIMGOLF_REPLAY_CACHE_PATH,
+)
+from vimgolf.replay import ReplayStep
+
+TRIE_FILENAME = 'trie.json'
+
+
+def get_cache_dir(challenge_id, src_in_path, vim_version):
+    key = hashlib.sha256()
+    key.update(challenge_id.encode('utf-8'))
+    for path in [src_in_path, PLAY_VIMRC_PATH]:
+        with open(path, 'rb') as f:
+            key.update(hashlib.sha256(f.read()).digest())
+    key.update(vim_version.encode('utf-8'))
+    return os.path.join(VIMGOLF_REPLAY_CACHE_PATH, key.hexdigest())
+
+
+def get_store(cache_dir):
+    return os.path.join(cache_dir, 'snapshots')
+
+
+class ReplayTrie:
+    """
+    Trie of replayed tokens, stored flat so that long sequences are not deeply
+    nested. Node 0 is the root (no tokens). nodes[i] is the [digest, changedtick]
+    of node i, and children['{i}:{token}'] is the child of node i for token.
+    """
+    def __init__(self, nodes=None, children=None):
+        self.nodes = nodes or []
+        self.children = children or {}
+
+    @classmethod
+    def load(cls, cache_dir):
+        path = os.path.join(cache_dir, TRIE_FILENAME)
+        if not os.path.exists(path):
+            return cls()
+        try:
+            with open(path) as f:
+                raw_trie = json.load(f)
+            return cls(nodes=raw_trie['nodes'], children=raw_trie['children'])
+        except Exception:
+            logger.exception('replay cache load failed: {}'.format(path))
+            return cls()
+
+    def save(self, cache_dir):
+        os.makedirs(cache_dir, exist_ok=True)
+        path = os.path.join(cache_dir, TRIE_FILENAME)
+        tmp_path = '{}.{}.tmp'.format(path, os.getpid())
+        with open(tmp_path, 'w') as f:
+            json.dump({'nodes': self.nodes, 'children': self.children}, f)
+        os.replace(tmp_path, path)
+
+    def lookup(self, tokens):
+        """ReplaySteps for the longest cached prefix of tokens (empty if none is cached)."""
+        if not self.nodes:
+            return []
+        node = 0
+        steps = [ReplayStep(*self.nodes[node])]
+        for token in tokens:
+            node = self.children.get('{}:{}'.format(node, token))
+            if node is None:
+                break
+            steps.append(ReplayStep(*self.nodes[node]))
+        return steps
+
+    def insert(self, tokens, steps):
+        """Add steps, which has a ReplayStep for each prefix of tokens."""
+        assert len(steps) == len(tokens) + 1
+        if not self.nodes:
+            self.nodes.append(list(steps[0]))
+        node = 0
+        for token, step in zip(tokens, steps[1:]):
+            key = '{}:{}'.format(node, token)
+            if key not in self.children:
+                self.children[key] = len(self.nodes)
+                self.nodes.append(list(step))
+            node = self.children[key]
+
+
+def evict(max_bytes=REPLAY_CACHE_MAX_BYTES, max_age=REPLAY_CACHE_MAX_AGE, keep=None):
+    """
+    Remove entries unused for max_age seconds, then the least recently used
+    beyond max_bytes. The entry at keep (e.g., in use) isn't removed.
+    """
+    if not os.path.isdir(VIMGOLF_REPLAY_CACHE_PATH):
+        return
+    now = time.time()
+    entries = []
+    for d in os.listdir(VIMGOLF_REPLAY_CACHE_PATH):
+        cache_dir = os.path.join(VIMGOLF_REPLAY_CACHE_PATH, d)
+        if not os.path.isdir(cache_dir):
+            continue
+        trie_path = os.path.join(cache_dir, TRIE_FILENAME)
+        last_used = os.path.getmtime(trie_path) if os.path.exists(trie_path) else 0
+        size = 0
+        for root, _, files in os.walk(cache_dir):
+            for file in files:
+                size += os.path.getsize(os.path.join(root, file))
+        entries.append((last_used, size, cache_dir))
+    total_size = sum(size for _, size, _ in entries)
+    for last_used, size, cache_dir in sorted(entries):
+        if now - last_used <= max_age and total_size <= max_bytes:
+            break
+        if keep and os.path.abspath(cache_dir) == os.path.abspath(keep):
+            continue
+        logger.info('evicting replay cache entry: {}'.format(cache_dir))
+        shutil.rmtree(cache_dir, ignore_errors=True)
+        total_size -= size
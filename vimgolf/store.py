@@ -0,0 +1,307 @@
+"""Single-file SQLite store of challenges, their specs, answers and answer aggregates.
+
+Challenges used to be stored as a directory each, with spec.json, metadata.json
+and answers.jsonl. Those are imported once, when the store is first opened.
+"""
+
+import contextlib
+import json
+import os
+import sqlite3
+import threading
+
+from vimgolf import logger, VIMGOLF_CHALLENGES_PATH, VIMGOLF_DB_PATH
+
+# 1: challenge directories imported
+# 2: aggregates updated by add_answer (rather than recomputed by update_metadata)
+SCHEMA_VERSION = 2
+
+# Number of answers fetched at a time by iter_answers
+ANSWERS_BATCH_SIZE = 256
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS challenges (
+    id TEXT PRIMARY KEY,
+    name TEXT,
+    description TEXT
+);
+CREATE TABLE IF NOT EXISTS specs (
+    challenge_id TEXT PRIMARY KEY REFERENCES challenges (id),
+    spec TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS answers (
+    id INTEGER PRIMARY KEY,
+    challenge_id TEXT NOT NULL REFERENCES challenges (id),
+    keys TEXT NOT NULL,
+    correct INTEGER NOT NULL,
+    score INTEGER NOT NULL,
+    uploaded INTEGER NOT NULL,
+    timestamp TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS answers_by_challenge ON answers (challenge_id, timestamp);
+CREATE TABLE IF NOT EXISTS aggregates (
+    challenge_id TEXT PRIMARY KEY REFERENCES challenges (id),
+    answers INTEGER NOT NULL,
+    uploaded INTEGER NOT NULL,
+    correct INTEGER NOT NULL,
+    best_score INTEGER NOT NULL
+);
+'''
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    """The process-wide Store, opened (and migrated) on first use."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = Store(VIMGOLF_DB_PATH, legacy_path=VIMGOLF_CHALLENGES_PATH)
+        return _store
+
+
+class Store:
+    def __init__(self, path, legacy_path=None):
+        # The connection is shared by threads, with lock serializing its use
+        self.connection = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.connection.row_factory = sqlite3.Row
+        self.lock = threading.RLock()
+        # Number of writes through this connection (see version)
+        self.writes = 0
+        with self.lock:
+            self.connection.execute('PRAGMA journal_mode = WAL')
+            self.connection.executescript(SCHEMA)
+            self._migrate(legacy_path)
+
+    def _migrate(self, legacy_path):
+        # The write lock is taken before checking the version, so that
+        # concurrent processes don't both import the legacy challenges.
+        self.connection.execute('BEGIN IMMEDIATE')
+        try:
+            version = self.connection.execute('PRAGMA user_version').fetchone()[0]
+            if version < 1 and legacy_path and os.path.isdir(legacy_path):
+                self._import_legacy(legacy_path)
+            if version < 2:
+                self._reindex()
+            if version < SCHEMA_VERSION:
+                self.connection.execute('PRAGMA user_version = {}'.format(SCHEMA_VERSION))
+            self.connection.commit()
+        except BaseException:
+            self.connection.rollback()
+            raise
+
+    def close(self):
+        self.connection.close()
+
+    def version(self):
+        """
+        Changes whenever the stored data may have changed, by this process or
+        another one, so that values read from the store can be cached until then.
+        """
+        with self.lock:
+            # data_version only changes on commits of other connections
+            data_version = self.connection.execute('PRAGMA data_version').fetchone()[0]
+            return data_version, self.writes
+
+    @contextlib.contextmanager
+    def _writing(self):
+        with self.lock, self.connection:
+            try:
+                yield
+            finally:
+                self.writes += 1
+
+    def challenge_ids(self):
+        with self.lock:
+            rows = self.connection.execute('SELECT id FROM challenges ORDER BY id').fetchall()
+        return [row['id'] for row in rows]
+
+    def get_spec(self, challenge_id):
+        with self.lock:
+            row = self.connection.execute(
+                'SELECT spec FROM specs WHERE challenge_id = ?', (challenge_id,)).fetchone()
+        return json.loads(row['spec']) if row else None
+
+    def save_spec(self, challenge_id, spec):
+        with self._writing():
+            self._ensure_challenge(challenge_id)
+            self.connection.execute(
+                'INSERT OR REPLACE INTO specs (challenge_id, spec) VALUES (?, ?)',
+                (challenge_id, json.dumps(spec)))
+
+    def add_answer(self, challenge_id, answer):
+        """Add an answer and update the aggregates, in a single transaction."""
+        with self._writing():
+            self._ensure_challenge(challenge_id)
+            self._insert_answer(challenge_id, answer)
+            self.connection.execute(
+                'INSERT OR IGNORE INTO aggregates (challenge_id, answers, uploaded, correct, best_score) '
+                'VALUES (?, 0, 0, 0, -1)', (challenge_id,))
+            correct = bool(answer['correct'])
+            self.connection.execute(
+                'UPDATE aggregates SET answers = answers + 1, uploaded = uploaded + ?, '
+                'correct = correct + ?, best_score = CASE '
+                'WHEN ? AND (best_score < 0 OR ? < best_score) THEN ? ELSE best_score END '
+                'WHERE challenge_id = ?',
+                (
+                    bool(answer['uploaded']),
+                    correct,
+                    correct,
+                    answer['score'],
+                    answer['score'],
+                    challenge_id,
+                ))
+
+    def get_answers(self, challenge_id):
+        """Answers of the challenge, oldest first."""
+        return list(self.iter_answers(challenge_id))
+
+    def iter_answers(
+            self,
+            challenge_id,
+            correct=None,
+            uploaded=None,
+            newest_first=False,
+            limit=None,
+            offset=0):
+        """
+        Generate answers of the challenge, oldest first (or newest first), skipping
+        the first offset ones and stopping after limit ones (if not None).
+        correct and uploaded (if not None) select answers with that value.
+        Rows are fetched in batches, so that only part of the answers are in memory.
+        """
+        query = 'SELECT keys, correct, score, uploaded, timestamp FROM answers WHERE challenge_id = ?'
+        params = [challenge_id]
+        for column, value in [('correct', correct), ('uploaded', uploaded)]:
+            if value is not None:
+                query += ' AND {} = ?'.format(column)
+                params.append(bool(value))
+        order = 'DESC' if newest_first else 'ASC'
+        query += ' ORDER BY timestamp {0}, id {0} LIMIT ? OFFSET ?'.format(order)
+        params.extend([-1 if limit is None else limit, offset])
+        with self.lock:
+            cursor = self.connection.execute(query, params)
+        try:
+            while True:
+                with self.lock:
+                    rows = cursor.fetchmany(ANSWERS_BATCH_SIZE)
+                if not rows:
+                    break
+                for row in rows:
+                    yield {
+                        'keys': json.loads(row['keys']),
+                        'correct': bool(row['correct']),
+                        'score': row['score'],
+                        'uploaded': bool(row['uploaded']),
+                        'timestamp': row['timestamp'],
+                    }
+        finally:
+            cursor.close()
+
+    def get_metadata(self, challenge_id):
+        """
+        The challenge's name and description (if known) and answer aggregates,
+        or None if the challenge isn't stored.
+        """
+        with self.lock:
+            row = self.connection.execute(
+                'SELECT name, description, COALESCE(answers, 0) AS answers, '
+                'COALESCE(uploaded, 0) AS uploaded, COALESCE(correct, 0) AS correct, '
+                'COALESCE(best_score, -1) AS best_score '
+                'FROM challenges LEFT JOIN aggregates ON aggregates.challenge_id = challenges.id '
+                'WHERE id = ?', (challenge_id,)).fetchone()
+        if not row:
+            return None
+        metadata = {
+            'uploaded': row['uploaded'],
+            'correct': row['correct'],
+            'answers': row['answers'],
+            'best_score': row['best_score'],
+        }
+        if row['name'] is not None:
+            metadata['name'] = row['name']
+        if row['description'] is not None:
+            metadata['description'] = row['description']
+        return metadata
+
+    def update_metadata(self, challenge_id, name=None, description=None):
+        """Set the name and description (unless None)."""
+        with self._writing():
+            self._ensure_challenge(challenge_id)
+            if name:
+                self.connection.execute(
+                    'UPDATE challenges SET name = ? WHERE id = ?', (name, challenge_id))
+            if description:
+                self.connection.execute(
+                    'UPDATE challenges SET description = ? WHERE id = ?', (description, challenge_id))
+
+    def reindex(self):
+        """Recompute the aggregates of all challenges from their answers, returning their number."""
+        with self._writing():
+            return self._reindex()
+
+    def _import_legacy(self, legacy_path):
+        logger.info('migrating challenges from {}'.format(legacy_path))
+        for challenge_id in sorted(os.listdir(legacy_path)):
+            challenge_dir = os.path.join(legacy_path, challenge_id)
+            if os.path.isdir(challenge_dir):
+                self._migrate_challenge(challenge_id, challenge_dir)
+
+    def _migrate_challenge(self, challenge_id, challenge_dir):
+        self._ensure_challenge(challenge_id)
+        spec = _read_legacy_json(os.path.join(challenge_dir, 'spec.json'))
+        if spec:
+            self.connection.execute(
+                'INSERT OR REPLACE INTO specs (challenge_id, spec) VALUES (?, ?)',
+                (challenge_id, json.dumps(spec)))
+        answers_path = os.path.join(challenge_dir, 'answers.jsonl')
+        if os.path.exists(answers_path):
+            with open(answers_path) as f:
+                for raw_answer in f:
+                    try:
+                        self._insert_answer(challenge_id, json.loads(raw_answer))
+                    except (ValueError, KeyError):
+                        logger.exception('answer migration failed: {}'.format(raw_answer))
+        metadata = _read_legacy_json(os.path.join(challenge_dir, 'metadata.json'))
+        if metadata is not None:
+            self.connection.execute(
+                'UPDATE challenges SET name = ?, description = ? WHERE id = ?',
+                (metadata.get('name'), metadata.get('description'), challenge_id))
+
+    def _ensure_challenge(self, challenge_id):
+        self.connection.execute('INSERT OR IGNORE INTO challenges (id) VALUES (?)', (challenge_id,))
+
+    def _insert_answer(self, challenge_id, answer):
+        self.connection.execute(
+            'INSERT INTO answers (challenge_id, keys, correct, score, uploaded, timestamp) '
+            'VALUES (?, ?, ?, ?, ?, ?)',
+            (
+                challenge_id,
+                json.dumps(answer['keys']),
+                bool(answer['correct']),
+                answer['score'],
+                bool(answer['uploaded']),
+                answer['timestamp'],
+            ))
+
+    def _reindex(self):
+        self.connection.execute('DELETE FROM aggregates')
+        cursor = self.connection.execute(
+            'INSERT INTO aggregates (challenge_id, answers, uploaded, correct, best_score) '
+            'SELECT challenges.id, COUNT(answers.id), COALESCE(SUM(uploaded), 0), '
+            'COALESCE(SUM(correct), 0), COALESCE(MIN(CASE WHEN correct THEN score END), -1) '
+            'FROM challenges LEFT JOIN answers ON answers.challenge_id = challenges.id '
+            'GROUP BY challenges.id')
+        return cursor.rowcount
+
+
+def _read_legacy_json(path):
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except ValueError:
+        logger.exception('migration failed: {}'.format(path))
+        return None
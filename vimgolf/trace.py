@@ -0,0 +1,141 @@
+"""Timing traces of the phases of a command (see 'vimgolf --trace FILE').
+
+A span is recorded as a complete event of the Chrome trace event format, which
+can be loaded by https://ui.perfetto.dev (or chrome://tracing). Spans on the
+same thread are shown nested if their times are.
+
+Tracing is off unless start_tracing is called, and spans then cost a function
+call and a check of a global (no time is taken and nothing is recorded).
+"""
+
+import functools
+import os
+import threading
+import time
+
+from vimgolf import logger
+from vimgolf.utils import write
+
+_tracer = None
+
+
+class Tracer:
+    def __init__(self, path):
+        self.path = path
+        self.pid = os.getpid()
+        self.start = time.perf_counter()
+        self.events = []
+        # thread id -> thread name, for the metadata events
+        self.threads = {}
+        self.lock = threading.Lock()
+
+    def add(self, name, category, start, end, args):
+        thread = threading.current_thread()
+        event = {
+            'name': name,
+            'cat': category,
+            'ph': 'X',
+            'ts': round((start - self.start) * 1e6, 3),
+            'dur': round((end - start) * 1e6, 3),
+            'pid': self.pid,
+            'tid': thread.ident,
+        }
+        if args:
+            event['args'] = args
+        with self.lock:
+            self.events.append(event)
+            self.threads.setdefault(thread.ident, thread.name)
+
+    def save(self):
+        # Imported here, since trivial commands don't need json (see vimgolf.main)
+        import json
+        with self.lock:
+            events = [
+                {'name': 'thread_name', 'ph': 'M', 'pid': self.pid, 'tid': tid, 'args': {'name': name}}
+                for tid, name in self.threads.items()
+            ] + self.events
+        with open(self.path, 'w') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+
+
+class Span:
+    """A span being recorded, as the context manager returned by span()."""
+    __slots__ = ('tracer', 'name', 'category', 'args', 'start')
+
+    def __init__(self, tracer, name, category, args):
+        self.tracer = tracer
+        self.name = name
+        self.category = category
+        self.args = args
+        self.start = None
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        end = time.perf_counter()
+        if exc_type is not None:
+            self.args['error'] = exc_type.__name__
+        self.tracer.add(self.name, self.category, self.start, end, self.args)
+
+
+class _NoSpan:
+    """Context manager returned by span() when tracing is off."""
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        pass
+
+
+_NO_SPAN = _NoSpan()
+
+
+def span(name, category, **args):
+    """Context manager that records a span of the code it runs, with args (e.g., a url)."""
+    tracer = _tracer
+    if tracer is None:
+        return _NO_SPAN
+    return Span(tracer, name, category, args)
+
+
+def traced(name, category):
+    """Decorator that records a span for each call of a function."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            tracer = _tracer
+            if tracer is None:
+                return fn(*args, **kwargs)
+            with Span(tracer, name, category, {}):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+_root_span = None
+
+
+def start_tracing(path, name):
+    """Record spans until stop_tracing, within a root span (e.g., for the command)."""
+    global _tracer, _root_span
+    _tracer = Tracer(path)
+    _root_span = Span(_tracer, name, 'vimgolf', {}).__enter__()
+
+
+def stop_tracing():
+    """Stop recording spans, and write the trace."""
+    global _tracer, _root_span
+    tracer, root_span = _tracer, _root_span
+    if tracer is None:
+        return
+    _tracer = _root_span = None
+    root_span.__exit__(None, None, None)
+    try:
+        tracer.save()
+    except Exception:
+        logger.exception('trace save failed: {}'.format(tracer.path))
+        write('The trace could not be written to {}'.format(tracer.path), err=True, fg='red')
@@ -1,31 +1,23 @@
 import os
 import sys
-import urllib.parse
-import urllib.request
-from collections import namedtuple
-from pathlib import Path
 
 import click
 
-USER_AGENT = 'vimgolf'
-
-HttpResponse = namedtuple('HttpResponse', 'code msg headers body')
-
 
 def http_request(url, data=None):
-    request = urllib.request.Request(url, data, headers={'User-Agent': USER_AGENT})
-    response = urllib.request.urlopen(request)
-    try:
-        charset = response.getheader('Content-Type').split(';')[1].split('=')[1].strip()
-    except Exception:
-        charset = 'utf-8'
-    body = response.read().decode(charset)
-    return HttpResponse(
-        code=response.code,
-        msg=response.msg,
-        headers=response.getheaders(),
-        body=body
-    )
+    """GET url through the response cache, or POST data to it."""
+    # Imported here, since http.client and ssl are slow to import, and most
+    # modules only import utils for the other helpers.
+    from vimgolf.http_cache import get_http_cache, is_offline, OfflineError
+    from vimgolf.http_client import get_http_client
+    from vimgolf.trace import span
+    if data is None:
+        with span('http_request', 'http', url=url, method='GET'):
+            return get_http_cache().request(url)
+    if is_offline():
+        raise OfflineError(url)
+    with span('http_request', 'http', url=url, method='POST'):
+        return get_http_client().request(url, data=data)
 
 
 def join_lines(string):
@@ -89,6 +81,8 @@ def find_executable_unix(executable):
 def find_executable_win32(executable):
     """Emulates how cmd.exe seemingly searches for executables."""
     def fixcase(path):
+        # pathlib is only imported on Windows, since it's slow to import
+        from pathlib import Path
         return str(Path(path).resolve())
     pathext = os.environ.get('PATHEXT', '.EXE')
     pathexts = list(x.upper() for x in pathext.split(os.pathsep))
@@ -1,8 +1,21 @@
+import json
+import math
 import os
+import re
+import signal
 import subprocess
 import sys
+import threading
+from collections import namedtuple
 
-from vimgolf import GOLF_VIM, Failure, logger, PLAY_VIMRC_PATH
+try:
+    import resource
+except ImportError:
+    # Not available on Windows, where only the timeout applies
+    resource = None
+
+from vimgolf import GOLF_VIM, Failure, logger, PLAY_VIMRC_PATH, VIMGOLF_EDITOR_CACHE_PATH
+from vimgolf.trace import span, traced
 from vimgolf.utils import find_executable, write, confirm
 
 BASE_ARGS = [
@@ -16,25 +29,122 @@ BASE_ARGS = [
 ]
 
 
-def vim(args, **run_kwargs):
+# Budgets for a headless session, each None for no limit: timeout and cpu
+# are seconds of wall-clock and CPU time, and memory is bytes of address space.
+SessionLimits = namedtuple('SessionLimits', 'timeout cpu memory')
+NO_LIMITS = SessionLimits(timeout=None, cpu=None, memory=None)
+
+# Exit statuses of sessions killed for going over their CPU budget
+# (SIGXCPU at the soft limit, SIGKILL at the hard one)
+CPU_LIMIT_STATUSES = frozenset(
+    -getattr(signal, name) for name in ['SIGXCPU', 'SIGKILL'] if hasattr(signal, name)
+)
+
+
+class SessionTimeout(Exception):
+    """A headless session went over its time budget, and was killed."""
+
+
+def vim(args, headless=False, limits=NO_LIMITS, quiet=False, **run_kwargs):
+    """Run vim with args, raising Failure if it fails (with a message, unless quiet)."""
     try:
-        _vim(args, **run_kwargs)
+        with span('vim', 'vim', headless=headless):
+            _vim(args, headless=headless, limits=limits, **run_kwargs)
     except Failure:
         raise
-    except Exception:
+    except Exception as e:
+        if _is_timeout(e, limits):
+            logger.info('{} session timed out'.format(GOLF_VIM))
+            raise SessionTimeout()
         logger.exception('{} execution failed'.format(GOLF_VIM))
-        write('The execution of {} has failed'.format(GOLF_VIM), err=True, fg='red')
+        if not quiet:
+            write('The execution of {} has failed'.format(GOLF_VIM), err=True, fg='red')
         raise Failure()
 
 
-def _vim(args, **run_kwargs):
+def _is_timeout(error, limits):
+    if isinstance(error, subprocess.TimeoutExpired):
+        return True
+    return (
+        isinstance(error, subprocess.CalledProcessError) and
+        error.returncode in CPU_LIMIT_STATUSES and
+        bool(limits.cpu)
+    )
+
+
+def find_vim():
     vim_path = find_executable(GOLF_VIM)
     if not vim_path:
         write('Unable to find "{}"'.format(GOLF_VIM), fg='red')
         write('Please update your PATH to include the directory with "{}"'.format(GOLF_VIM), fg='red')
         raise Failure()
-    vim_name = os.path.basename(os.path.realpath(vim_path))
+    return vim_path
+
+
+# Features that nvim has built in, rather than listing them in `nvim --version`
+NVIM_FEATURES = frozenset(['channel', 'job', 'timers'])
+
+# A feature in the output of `vim --version` (e.g., +channel, -clientserver,
+# +fork(), or +python3/dyn for a dynamically loaded feature)
+FEATURE_PATTERN = re.compile(r'^([+-])[+-]?(\w+)(?:\(\)|/\w+)?$')
+
+
+class Editor(namedtuple('Editor', 'path name version features')):
+    """
+    The editor that vimgolf runs: path is GOLF_VIM found on the PATH, name is the
+    name of the executable (e.g., gvim or nvim, without extension on Windows),
+    version is the output of `--version`, and features are the included features.
+    """
+    __slots__ = ()
+
+    @property
+    def is_nvim(self):
+        return self.name == 'nvim'
+
+    def has(self, feature):
+        """Whether the editor supports a feature, as with has() in vim (e.g., has('clientserver'))."""
+        return feature in self.features or (self.is_nvim and feature in NVIM_FEATURES)
+
+
+_editor = None
+_editor_lock = threading.Lock()
 
+
+def get_editor():
+    """
+    The process-wide Editor. It's cached on disk, so that it's found and probed
+    again only once PATH, GOLF_VIM or the executable changes.
+    """
+    global _editor
+    with _editor_lock:
+        if _editor is None:
+            _editor = load_editor()
+        if _editor is None:
+            _editor = probe_editor()
+            save_editor(_editor)
+        return _editor
+
+
+@traced('probe_editor', 'vim')
+def probe_editor():
+    vim_path = find_vim()
+    try:
+        result = subprocess.run(
+            [vim_path, '--version'],
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            check=True
+        )
+    except Exception:
+        logger.exception('{} version check failed'.format(GOLF_VIM))
+        write('The execution of {} has failed'.format(GOLF_VIM), err=True, fg='red')
+        raise Failure()
+    version = result.stdout.decode('utf-8', errors='replace')
+    return Editor(vim_path, get_vim_name(vim_path), version, parse_features(version))
+
+
+def get_vim_name(vim_path):
+    vim_name = os.path.basename(os.path.realpath(vim_path))
     if sys.platform == 'win32':
         # Remove executable extension (.exe, .bat, .cmd, etc.) from 'vim_name'
         base, ext = os.path.splitext(vim_name)
@@ -43,6 +153,187 @@ def _vim(args, **run_kwargs):
             if ext.upper() == pathext.upper():
                 vim_name = base
                 break
+    return vim_name
+
+
+def parse_features(version):
+    """
+    The included features in the output of `--version`: the list that follows
+    "Features included (+) or not (-):" for vim, or the "Features:" line for nvim.
+    The list ends with the first line without features. Other words are skipped.
+    """
+    features = set()
+    in_features = False
+    for line in version.splitlines():
+        if line.startswith('Features:'):
+            line = line[len('Features:'):]
+            in_features = True
+        elif 'Features included' in line:
+            in_features = True
+            continue
+        if not in_features:
+            continue
+        matches = [match for match in map(FEATURE_PATTERN.match, line.split()) if match]
+        if not matches:
+            break
+        features.update(match.group(2) for match in matches if match.group(1) == '+')
+    return frozenset(features)
+
+
+# Version of the cached Editor, changed so that editors are probed again
+# (e.g., when the features are parsed differently)
+EDITOR_CACHE_VERSION = 2
+
+
+def get_editor_cache_key():
+    return {'PATH': os.environ.get('PATH', os.defpath), 'GOLF_VIM': GOLF_VIM, 'version': EDITOR_CACHE_VERSION}
+
+
+def get_binary_key(vim_path):
+    """Identifies the executable at vim_path, to tell if it was changed (e.g., upgraded)."""
+    return [os.path.realpath(vim_path), os.stat(vim_path).st_mtime_ns]
+
+
+def load_editor():
+    """The Editor cached on disk, unless it's for a different PATH, GOLF_VIM or executable."""
+    try:
+        with open(VIMGOLF_EDITOR_CACHE_PATH) as f:
+            cached = json.load(f)
+        if cached['key'] != get_editor_cache_key():
+            return None
+        editor = Editor(cached['path'], cached['name'], cached['version'], frozenset(cached['features']))
+        if get_binary_key(editor.path) != cached['binary']:
+            return None
+        return editor
+    except FileNotFoundError:
+        return None
+    except Exception:
+        logger.exception('editor cache load failed')
+        return None
+
+
+def save_editor(editor):
+    tmp_path = '{}.{}.tmp'.format(VIMGOLF_EDITOR_CACHE_PATH, os.getpid())
+    try:
+        with open(tmp_path, 'w') as f:
+            json.dump({
+                'key': get_editor_cache_key(),
+                'binary': get_binary_key(editor.path),
+                'path': editor.path,
+                'name': editor.name,
+                'version': editor.version,
+                'features': sorted(editor.features),
+            }, f)
+        os.replace(tmp_path, VIMGOLF_EDITOR_CACHE_PATH)
+    except Exception:
+        logger.exception('editor cache save failed')
+
+
+def start_headless_vim(args, limits=NO_LIMITS):
+    """
+    Start a headless vim that keeps running in the background, returning its Popen.
+    limits.timeout is left to the caller, and limits.cpu applies to the whole session.
+    """
+    try:
+        vim_args, _ = _vim_args(args, headless=True)
+        # stdin is kept open until the session is over (see _vim)
+        process = subprocess.Popen(
+            vim_args,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.DEVNULL,
+        )
+        apply_limits(process, limits)
+        return process
+    except Failure:
+        raise
+    except Exception:
+        logger.exception('{} execution failed'.format(GOLF_VIM))
+        write('The execution of {} has failed'.format(GOLF_VIM), err=True, fg='red')
+        raise Failure()
+
+
+def extend_cpu_limit(process, seconds):
+    """
+    Let a running session use up to seconds more of CPU time, for sessions
+    that run several jobs. Only supported on Linux (does nothing elsewhere).
+    """
+    if not hasattr(resource, 'prlimit'):
+        return
+    try:
+        with open('/proc/{}/stat'.format(process.pid)) as f:
+            # Fields after the command name (which may contain spaces), from the 3rd on
+            fields = f.read().rsplit(')', 1)[1].split()
+        utime, stime = int(fields[11]), int(fields[12])
+        used = (utime + stime) / os.sysconf('SC_CLK_TCK')
+        _, hard = resource.prlimit(process.pid, resource.RLIMIT_CPU)
+        resource.prlimit(process.pid, resource.RLIMIT_CPU, (_soft_limit(used + seconds, hard), hard))
+    except (OSError, ValueError):
+        logger.exception('cpu limit update failed')
+
+
+def apply_limits(process, limits):
+    """
+    Apply the CPU and memory limits to a started process. Only supported on
+    Linux (elsewhere, only the timeout applies). The limits are applied from
+    the parent, since a preexec_fn isn't safe while other threads are running.
+    """
+    if not hasattr(resource, 'prlimit'):
+        return
+    try:
+        for limit, value in [(resource.RLIMIT_CPU, limits.cpu), (resource.RLIMIT_AS, limits.memory)]:
+            if value:
+                _, hard = resource.prlimit(process.pid, limit)
+                resource.prlimit(process.pid, limit, (_soft_limit(value, hard), hard))
+    except ProcessLookupError:
+        # The process is already over
+        pass
+
+
+def _soft_limit(value, hard):
+    value = math.ceil(value)
+    if hard == resource.RLIM_INFINITY:
+        return value
+    return min(value, hard)
+
+
+def _vim(args, headless=False, limits=NO_LIMITS, **run_kwargs):
+    vim_args, vim_name = _vim_args(args, headless=headless)
+    stdin_pipe = None
+    if headless:
+        run_kwargs.setdefault('timeout', limits.timeout)
+        # vim exits when its input reaches EOF, so it is given an empty pipe
+        # that stays open for the whole session.
+        stdin_pipe = os.pipe()
+        run_kwargs.setdefault('stdin', stdin_pipe[0])
+        run_kwargs.setdefault('stdout', subprocess.DEVNULL)
+    try:
+        _run(vim_args, limits if headless else NO_LIMITS, **run_kwargs)
+    finally:
+        if stdin_pipe:
+            for fd in stdin_pipe:
+                os.close(fd)
+    # On Windows, vimgolf freezes when reading input after nvim's exit.
+    # For an unknown reason, shell'ing out an effective no-op works-around the issue
+    if vim_name == 'nvim' and sys.platform == 'win32':
+        os.system('')
+
+
+def _run(args, limits, check=False, timeout=None, **popen_kwargs):
+    """Like subprocess.run, with limits applied to the process (see apply_limits)."""
+    with subprocess.Popen(args, **popen_kwargs) as process:
+        apply_limits(process, limits)
+        try:
+            process.wait(timeout=timeout)
+        except BaseException:
+            process.kill()
+            raise
+    if check and process.returncode:
+        raise subprocess.CalledProcessError(process.returncode, args)
+
+
+def _vim_args(args, headless=False):
+    editor = get_editor()
+    vim_path, vim_name = editor.path, editor.name
 
     # As of 2019/3/2, on Windows, nvim-qt doesn't support --nofork.
     # Issue a warning as opposed to failing, since this may change.
@@ -64,9 +355,12 @@ def _vim(args, **run_kwargs):
     # For nvim-qt, options after '--' are passed to nvim.
     if vim_name == 'nvim-qt':
         vim_args.append('--')
+    # Headless sessions (e.g., replays) run without a UI and with no terminal attached.
+    # Keys are expected to come from the scripts that are passed in 'args'.
+    if headless:
+        if vim_name == 'nvim':
+            vim_args.append('--headless')
+        else:
+            vim_args.extend(['-v', '--not-a-term'])
     vim_args.extend(args)
-    subprocess.run(vim_args, **run_kwargs)
-    # On Windows, vimgolf freezes when reading input after nvim's exit.
-    # For an unknown reason, shell'ing out an effective no-op works-around the issue
-    if vim_name == 'nvim' and sys.platform == 'win32':
-        os.system('')
+    return vim_args, vim_name
@@ -0,0 +1,119 @@
+" Replays g:replayKeys against the current buffer in a single session.
+" Keys are fed one at a time from a timer, so each one is processed as if it
+" was typed (pending operators, insert mode, the command line, etc. are all
+" preserved between steps). Feeding them at once could also have vim read
+" e.g. <Esc>O as a terminal key code. For each of the g:replayCount steps from
+" g:replayStart on, the digest of the buffer and its b:changedtick (-1 once vim
+" has exited) are recorded, and written to g:replayStepsPath. Each distinct
+" buffer is written once to g:replayStore, named by its digest.
+"
+" If g:replayKeylogPath is set, the keys that were fed are written to it, in
+" the same format as a -W keylog. When run by a worker (see vimgolf-worker.vim),
+" the session isn't quit once done. g:replayFinish (if set) is run instead,
+" after leaving any pending mode, and the worker is told the job is over. Keys
+" that would quit vim only close the job's windows in a worker, which is then
+" handled as if vim had exited.
+
+let s:done = 0
+let s:steps = []
+let s:stored = {}
+let s:last_tick = -1
+let s:typed = ''
+
+function! ReplayStart()
+    let s:buffer = bufnr('%')
+    let s:path = expand('%:p')
+    let s:step = 0
+    let s:stop = g:replayStart + g:replayCount
+    augroup vimgolf_replay
+        autocmd!
+        autocmd VimLeavePre * call s:ReplayLeave()
+    augroup END
+    call timer_start(0, function('s:ReplayStep'))
+endfunction
+
+function! s:ReplayStep(timer)
+    if exists('*WorkerQuit') && WorkerQuit()
+        call s:ReplayLeave()
+        let s:done = 1
+        call s:ReplayFinish()
+        return
+    endif
+    if s:step < g:replayStart
+        call s:ReplayFeed()
+        call timer_start(0, function('s:ReplayStep'))
+        return
+    endif
+    let l:tick = getbufvar(s:buffer, 'changedtick')
+    if !empty(s:steps) && l:tick == s:last_tick
+        " b:changedtick is unchanged, and so is the buffer.
+        call add(s:steps, s:steps[-1])
+    else
+        call s:ReplaySnapshot(getbufline(s:buffer, 1, '$'), l:tick)
+    endif
+    let s:last_tick = l:tick
+    if s:step + 1 >= s:stop
+        let s:done = 1
+        call s:ReplayWrite()
+        if exists('*WorkerDone')
+            call s:ReplayFinish()
+            return
+        endif
+        qall!
+    endif
+    call s:ReplayFeed()
+    call timer_start(0, function('s:ReplayStep'))
+endfunction
+
+function! s:ReplayFinish()
+    let l:finish = exists('g:replayFinish') ? g:replayFinish . '|' : ''
+    call feedkeys("\<Esc>\<Esc>\<Esc>:\<C-U>" . l:finish . "call WorkerDone()\<CR>", '')
+endfunction
+
+function! s:ReplayFeed()
+    let l:key = g:replayKeys[s:step]
+    call feedkeys(l:key, 't')
+    if exists('g:replayKeylogPath')
+        let s:typed .= l:key
+    endif
+    let s:step += 1
+endfunction
+
+" A NL in a line written with the "b" flag stands for a NUL, so the keys are
+" split at NLs (which are joined back as line breaks) to write them unchanged.
+function! s:ReplayWrite()
+    call writefile(s:steps, g:replayStepsPath)
+    if exists('g:replayKeylogPath')
+        call writefile(split(s:typed, "\n", 1), g:replayKeylogPath, 'b')
+    endif
+endfunction
+
+" The keys may quit vim on their own (e.g., ZZ). The remaining steps all see
+" the file as it was last written, like a separate replay of each of them would.
+function! s:ReplayLeave()
+    if s:done
+        return
+    endif
+    let l:lines = filereadable(s:path) ? readfile(s:path) : []
+    let l:count = s:stop - max([s:step, g:replayStart])
+    if l:count > 0
+        call s:ReplaySnapshot(l:lines, -1)
+        call extend(s:steps, repeat(s:steps[-1:], l:count - 1))
+    endif
+    call s:ReplayWrite()
+endfunction
+
+" string() is used for the digest since joined lines are ambiguous (a NL in a
+" line stands for a NUL). Parallel sessions may share the store, so a snapshot
+" that another session has already written is skipped as well.
+function! s:ReplaySnapshot(lines, tick)
+    let l:digest = sha256(string(a:lines))
+    if !has_key(s:stored, l:digest)
+        let l:path = g:replayStore . '/' . l:digest
+        if !filereadable(l:path)
+            call writefile(a:lines, l:path)
+        endif
+        let s:stored[l:digest] = 1
+    endif
+    call add(s:steps, l:digest . ' ' . a:tick)
+endfunction
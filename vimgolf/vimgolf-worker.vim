@@ -0,0 +1,73 @@
+" Runs jobs in a long-lived headless session, so that vim and the vimrc are
+" loaded once rather than for each job. Jobs are polled from g:workerPath,
+" where job N is written to jobN.json as {"file": ..., "script": ...}. The file
+" is edited and the script is sourced. The job calls WorkerDone() once it is
+" over, which writes doneN. Files are never deleted, since restricted mode
+" (-Z) doesn't allow it.
+"
+" The state left by the previous job is reset before each job. Some state
+" can't be reset from a script (e.g., what `.` repeats, and the registers ".
+" and ":), so a job may still behave differently than in a new session.
+"
+" Each job is run in a tab of its own, in front of a home tab. Keys that close
+" the last window of the job (e.g., ZZ or :wq) then leave the home tab rather
+" than quitting vim, which the job checks with WorkerQuit(), so that the
+" session is kept for the next job. Keys that quit all windows (e.g., :qa)
+" still quit vim.
+
+let s:job = 0
+
+function! s:WorkerPoll(timer)
+    let l:path = g:workerPath . '/job' . s:job . '.json'
+    if !filereadable(l:path)
+        return
+    endif
+    let l:job = json_decode(join(readfile(l:path), "\n"))
+    call timer_pause(s:timer, 1)
+    call s:WorkerReset()
+    tabnew
+    execute 'args' fnameescape(l:job.file)
+    execute 'source' fnameescape(l:job.script)
+endfunction
+
+" Whether the job has closed all its windows, which would have quit vim
+function! WorkerQuit()
+    return tabpagenr('$') == 1 && winnr('$') == 1 && win_getid() == s:home
+endfunction
+
+function! WorkerDone()
+    call writefile([], g:workerPath . '/done' . s:job)
+    let s:job += 1
+    call timer_pause(s:timer, 0)
+endfunction
+
+function! s:WorkerReset()
+    silent! tabonly!
+    silent! only!
+    silent! %bwipeout!
+    for l:register in split('"0123456789abcdefghijklmnopqrstuvwxyz-', '\zs')
+        call setreg(l:register, [])
+    endfor
+    let @/ = ''
+    call setcharsearch({'char': '', 'forward': 1, 'until': 0})
+    for l:history in ['cmd', 'search', 'expr', 'input', 'debug']
+        call histdel(l:history)
+    endfor
+    delmarks A-Z0-9
+    clearjumps
+    mapclear
+    mapclear!
+    abclear
+    set all&
+    " Options that were set by command line arguments (-n and -i NONE)
+    set updatecount=0
+    silent! set viminfofile=NONE
+    silent! set shadafile=NONE
+    execute 'source' fnameescape(g:workerVimrc)
+    " The tab line would take a screen line from the windows of the job
+    set showtabline=0
+    setlocal nobuflisted
+    let s:home = win_getid()
+endfunction
+
+let s:timer = timer_start(5, function('s:WorkerPoll'), {'repeat': -1})
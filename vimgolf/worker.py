@@ -0,0 +1,130 @@
+"""Pool of long-lived headless vim sessions that run jobs (see vimgolf-worker.vim).
+
+Starting vim and loading the vimrc takes much longer than replaying a typical
+key sequence, so batches of replays are run by reusing sessions.
+"""
+
+import itertools
+import json
+import os
+import queue
+import threading
+import time
+
+from vimgolf import logger, PLAY_VIMRC_PATH, WORKER_POLL_INTERVAL, WORKER_VIM_PATH
+from vimgolf.replay import to_vim_literal
+from vimgolf.trace import traced
+from vimgolf.vim import (
+    start_headless_vim,
+    extend_cpu_limit,
+    BASE_ARGS,
+    CPU_LIMIT_STATUSES,
+    NO_LIMITS,
+    SessionTimeout,
+)
+
+
+class Worker:
+    """A session whose limits apply to each job (the CPU limit on Linux only)."""
+    def __init__(self, path, limits=NO_LIMITS):
+        self.path = path
+        self.limits = limits
+        self.jobs = itertools.count()
+        os.makedirs(path)
+        self.process = start_headless_vim(BASE_ARGS + [
+            '--cmd', 'let g:workerPath = {}'.format(to_vim_literal(path)),
+            '--cmd', 'let g:workerVimrc = {}'.format(to_vim_literal(PLAY_VIMRC_PATH)),
+            '-S', WORKER_VIM_PATH,
+        ], limits=limits._replace(cpu=None))
+
+    @traced('Worker.run', 'vim')
+    def run(self, file_path, script_path):
+        """
+        Run a job, returning False if vim has exited (e.g., the job's keys quit vim).
+        Raises SessionTimeout if the job goes over its limits, leaving the worker unusable.
+        """
+        if self.limits.cpu:
+            extend_cpu_limit(self.process, self.limits.cpu)
+        deadline = None
+        if self.limits.timeout:
+            deadline = time.monotonic() + self.limits.timeout
+        job = next(self.jobs)
+        job_path = os.path.join(self.path, 'job{}.json'.format(job))
+        done_path = os.path.join(self.path, 'done{}'.format(job))
+        tmp_path = '{}.tmp'.format(job_path)
+        with open(tmp_path, 'w') as f:
+            json.dump({'file': file_path, 'script': script_path}, f)
+        os.replace(tmp_path, job_path)
+        while not os.path.exists(done_path):
+            status = self.process.poll()
+            if status is not None:
+                if status in CPU_LIMIT_STATUSES and self.limits.cpu:
+                    raise SessionTimeout()
+                return False
+            if deadline and time.monotonic() > deadline:
+                logger.info('vim worker timed out: {}'.format(self.path))
+                raise SessionTimeout()
+            time.sleep(WORKER_POLL_INTERVAL)
+        return True
+
+    def close(self):
+        if self.process.poll() is None:
+            # A worker that timed out may be busy, and not handle SIGTERM
+            self.process.kill()
+        self.process.wait()
+        self.process.stdin.close()
+
+
+class WorkerPool:
+    """
+    size Workers, each running a job at a time. A worker that has exited or
+    timed out is replaced right away, so that the new one starts while other
+    jobs run.
+    """
+    def __init__(self, workspace, size, limits=NO_LIMITS):
+        self.workspace = workspace
+        self.limits = limits
+        self.ids = itertools.count()
+        self.idle = queue.Queue()
+        self.workers = set()
+        self.lock = threading.Lock()
+        for _ in range(size):
+            self.idle.put(self._start_worker())
+
+    def _start_worker(self):
+        path = os.path.join(self.workspace, 'worker{}'.format(next(self.ids)))
+        worker = Worker(path, self.limits)
+        with self.lock:
+            self.workers.add(worker)
+        return worker
+
+    def _replace_worker(self, worker):
+        logger.info('replacing vim worker: {}'.format(worker.path))
+        with self.lock:
+            self.workers.discard(worker)
+        worker.close()
+        return self._start_worker()
+
+    @traced('WorkerPool.run', 'vim')
+    def run(self, file_path, script_path):
+        """Edit file_path and source script_path in an idle worker, waiting until the job is done."""
+        worker = self.idle.get()
+        alive = False
+        try:
+            alive = worker.run(file_path, script_path)
+        finally:
+            if not alive:
+                worker = self._replace_worker(worker)
+            self.idle.put(worker)
+
+    def close(self):
+        with self.lock:
+            workers, self.workers = self.workers, set()
+        for worker in workers:
+            worker.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()